@@ -0,0 +1,68 @@
+"""IOC set microbenchmark
+
+Times IOCSet add, remove and collapse against the list code the IOC
+operations used before it (dict.fromkeys copies and a list.remove loop) for
+random IPv4 addresses, removing half of them again. Also prints how many rule
+entries a clustered IOC list (consecutive addresses) needs after collapsing.
+
+usage: python benchmarks/bench_ioc_set.py [SIZE ...]
+"""
+
+import sys
+import time
+import random
+import itertools
+import ipaddress
+from psm_bench import connector_module
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def list_add(existing, addresses):
+    # ioc_block_add_ip before IOCSet
+    new_ioc_list = list(dict.fromkeys(existing))
+    new_ioc_list.extend(list(dict.fromkeys(addresses)))
+    return list(dict.fromkeys(new_ioc_list))
+
+
+def list_remove(existing, addresses):
+    # ioc_block_remove_ip before IOCSet
+    new_ioc_list = list(dict.fromkeys(existing))
+    for address in list(dict.fromkeys(addresses)):
+        try:
+            new_ioc_list.remove(address)
+        except ValueError:
+            pass
+    return new_ioc_list
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 100000]
+    IOCSet = connector_module('ioc_set').IOCSet
+    random.seed(1)
+
+    for size in sizes:
+        addresses = [str(ipaddress.IPv4Address(random.getrandbits(32))) for _ in range(size)]
+        removed = addresses[::2]
+
+        ioc_set = IOCSet()
+        _, add_ms = timed(ioc_set.add, addresses)
+        _, remove_ms = timed(ioc_set.remove, removed)
+        _, collapse_ms = timed(ioc_set.collapse)
+        ioc_list, list_add_ms = timed(list_add, [], addresses)
+        _, list_remove_ms = timed(list_remove, ioc_list, removed)
+
+        clustered = [str(address) for address in itertools.islice(ipaddress.ip_network('10.0.0.0/8').hosts(), size)]
+        entries = len(IOCSet(clustered).collapse())
+
+        print(f'{size:>7} addresses: IOCSet add {add_ms:.1f} ms, remove {remove_ms:.1f} ms, collapse {collapse_ms:.1f} ms | '
+              f'list add {list_add_ms:.1f} ms, remove {list_remove_ms:.1f} ms | '
+              f'{size} clustered addresses collapse to {entries} entries')
+
+
+if __name__ == '__main__':
+    main()
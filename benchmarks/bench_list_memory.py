@@ -0,0 +1,87 @@
+"""List decoding memory benchmark
+
+Serves N workloads from the mock PSM in a child process and compares the
+peak Python memory (tracemalloc) of collecting the list with list_endpoint,
+which parses every page's full body, against consuming it one item at a time
+with iterate_list_items, which decodes each page incrementally. Each is run
+with a single page holding the whole list and with the default page size.
+
+usage: python benchmarks/bench_list_memory.py [--workloads N]
+"""
+
+import sys
+import time
+import argparse
+import subprocess
+import tracemalloc
+from psm_bench import MockPSM, mock_config, remove_state_files, connector_module
+
+
+ENDPOINT = '/configs/workload/v1/workloads'
+
+
+def workload(i):
+    address = f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'
+    return {
+        'kind': 'Workload',
+        'meta': {'name': f'workload-{i}', 'tenant': 'default', 'labels': {'app': 'bench'}, 'uuid': f'{i:036d}'},
+        'spec': {'host-name': f'host-{i % 100}', 'interfaces': [
+            {'mac-address': f'0050.56{i % 256:02x}.{i // 256 % 65536:04x}', 'ip-addresses': [address], 'micro-seg-vlan': 100}
+        ]},
+        'status': {'propagation-status': {'generation-id': '1', 'updated': 1, 'pending': 0}}
+    }
+
+
+def serve(workloads):
+    mock = MockPSM(lists={ENDPOINT: [workload(i) for i in range(workloads)]})
+    print(mock.server.server_address[1], flush=True)
+    sys.stdin.read()
+    mock.close()
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, peak / 1e6, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workloads', type=int, default=20000)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.workloads)
+
+    server = subprocess.Popen(
+        [sys.executable, __file__, '--serve', '--workloads', str(args.workloads)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        port = int(server.stdout.readline())
+        utils = connector_module('utils')
+        constants = connector_module('constants')
+        config = mock_config(port, response_cache_size=0)
+        utils.get_psm(config)
+
+        for page_size in (args.workloads, constants.LIST_PAGE_SIZE):
+            collected, collect_mb, collect_s = measure(
+                lambda: len(utils.list_endpoint(config, ENDPOINT, {'page_size': page_size})['items'])
+            )
+            streamed, stream_mb, stream_s = measure(
+                lambda: sum(1 for _ in utils.iterate_list_items(config, ENDPOINT, page_size))
+            )
+            print(f'page_size {page_size:>6}: list_endpoint {collected} items, peak {collect_mb:.1f} MB, {collect_s:.2f}s | '
+                  f'iterate_list_items {streamed} items, peak {stream_mb:.2f} MB, {stream_s:.2f}s')
+        utils.release_psm(config)
+    finally:
+        server.communicate('')
+        remove_state_files()
+
+
+if __name__ == '__main__':
+    main()
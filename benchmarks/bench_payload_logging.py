@@ -0,0 +1,91 @@
+"""Policy payload logging benchmark
+
+Runs alternating isolate_host and unisolate_host operations against the mock
+PSM holding a policy of N rules, with the connector logger writing to a file
+at INFO and at WARNING. Compares the size-aware payload logging with the
+eager f-string logging of the loaded rules and the PUT body it replaced, and
+prints the median operation latency and the log bytes written per operation.
+
+usage: python benchmarks/bench_payload_logging.py [--rules N] [--operations N]
+"""
+
+import os
+import logging
+import argparse
+import tempfile
+import statistics
+import time
+from psm_bench import MockPSM, connector_module
+
+
+def eager_log_policy_payload(config, message, payload, rules, base_count=None, changes=None):
+    # the INFO logging of PolicyTransaction before payload_log, formatted at every level
+    logger = logging.getLogger(connector_module('constants').LOGGER_NAME)
+    if message.startswith('Loaded'):
+        logger.info(f'rules: {rules}')
+    else:
+        logger.info(f'{message} with {payload}')
+
+
+def policy_rules(count):
+    return [
+        {
+            'proto-ports': [{'protocol': 'tcp', 'ports': str(1000 + i % 60000)}], 'action': 'permit',
+            'from-ip-addresses': [f'10.{i // 256 % 256}.{i % 256}.{j}' for j in range(8)],
+            'to-ip-addresses': ['0.0.0.0/0']
+        }
+        for i in range(count)
+    ]
+
+
+def run(config, operations, log_filename):
+    isolate_host = connector_module('isolate_host').isolate_host
+    unisolate_host = connector_module('unisolate_host').unisolate_host
+    params = {'host_source_ip': '192.168.0.1'}
+    latencies = []
+    for i in range(operations):
+        start = time.perf_counter()
+        (isolate_host if i % 2 == 0 else unisolate_host)(config, params)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), os.path.getsize(log_filename) / operations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rules', type=int, default=5000)
+    parser.add_argument('--operations', type=int, default=20)
+    args = parser.parse_args()
+
+    policy = connector_module('policy')
+    logger = logging.getLogger(connector_module('constants').LOGGER_NAME)
+    logger.propagate = False
+    size_aware = policy.log_policy_payload
+
+    mock = MockPSM(rules=policy_rules(args.rules))
+    config = mock.config()
+    # log in and warm up the pooled session before measuring
+    connector_module('isolate_host').isolate_host(config, {'host_source_ip': '192.168.0.1'})
+    connector_module('unisolate_host').unisolate_host(config, {'host_source_ip': '192.168.0.1'})
+    try:
+        for level in ('INFO', 'WARNING'):
+            for name, log_payload in (('eager f-strings', eager_log_policy_payload), ('size-aware', size_aware)):
+                with tempfile.NamedTemporaryFile(prefix='psm_bench_', suffix='.log') as log_file:
+                    handler = logging.FileHandler(log_file.name, 'w')
+                    logger.addHandler(handler)
+                    logger.setLevel(getattr(logging, level))
+                    policy.log_policy_payload = log_payload
+                    try:
+                        latency, log_bytes = run(config, args.operations, log_file.name)
+                    finally:
+                        policy.log_policy_payload = size_aware
+                        logger.removeHandler(handler)
+                        handler.close()
+                print(f'{args.rules} rules, {level:7} {name:15}: median {latency * 1000:.1f} ms per operation, '
+                      f'{log_bytes:,.0f} log bytes per operation')
+    finally:
+        connector_module('utils').release_psm(config)
+        mock.close()
+
+
+if __name__ == '__main__':
+    main()
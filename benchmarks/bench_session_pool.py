@@ -0,0 +1,67 @@
+"""Session pool benchmark
+
+Runs alternating isolate_host and unisolate_host operations against the local
+mock PSM, first with a fresh PensandoPSM per request (state loaded from the
+/tmp state file and a new connection each time, as before the session pool)
+and then with the pooled session. Prints requests, new connections (TLS
+handshakes with --tls) and the median latency per operation.
+
+usage: python benchmarks/bench_session_pool.py [--tls] [--operations N]
+"""
+
+import argparse
+import statistics
+import time
+import warnings
+from psm_bench import MockPSM, connector_module
+
+
+def run(mock, config, operations):
+    isolate_host = connector_module('isolate_host').isolate_host
+    unisolate_host = connector_module('unisolate_host').unisolate_host
+    params = {'host_source_ip': '10.9.9.9'}
+    # warm up: login and the first policy write
+    isolate_host(config, params)
+    unisolate_host(config, params)
+
+    requests, connections, latencies = [], [], []
+    for i in range(operations):
+        mock.reset_counters()
+        start = time.perf_counter()
+        (isolate_host if i % 2 == 0 else unisolate_host)(config, params)
+        latencies.append(time.perf_counter() - start)
+        requests.append(len(mock.requests))
+        connections.append(len(mock.new_connections))
+    return statistics.mean(requests), statistics.mean(connections), statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tls', action='store_true', help='serve HTTPS (needs the openssl command)')
+    parser.add_argument('--operations', type=int, default=20)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+
+    utils = connector_module('utils')
+    pooled_get_psm = utils.get_psm
+
+    def unpooled_get_psm(config):
+        utils.release_psm(config)
+        return pooled_get_psm(config)
+
+    connection = 'TLS handshakes' if args.tls else 'connections'
+    for name, get_psm in (('session per request', unpooled_get_psm), ('session pool', pooled_get_psm)):
+        mock = MockPSM(tls=args.tls)
+        utils.get_psm = get_psm
+        try:
+            requests, connections, latency = run(mock, mock.config(), args.operations)
+        finally:
+            utils.get_psm = pooled_get_psm
+            utils.release_psm(mock.config())
+            mock.close()
+        print(f'{name:20}: {requests:.1f} requests, {connections:.1f} {connection}, '
+              f'median {latency * 1000:.1f} ms per operation')
+
+
+if __name__ == '__main__':
+    main()
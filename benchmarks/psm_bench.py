@@ -0,0 +1,198 @@
+"""Shared helpers for the connector benchmarks
+
+Loads the connector package from this checkout and runs a local mock PSM
+server: login with a sid cookie, a tenant's NetworkSecurityPolicy with
+resource-version checks, and paginated list endpoints. The connector needs
+the FortiSOAR connector SDK (connectors.core.connector) and requests.
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import importlib
+import importlib.util
+import importlib.machinery
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CONNECTOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pensando-policy-servicemanager')
+PACKAGE = 'pensando_psm'
+TENANT = 'default'
+POLICY_NAME = 'bench-policy'
+POLICY_PATH = f'/configs/security/v1/tenant/{TENANT}/networksecuritypolicies'
+
+
+def load_connector():
+    """Import the connector directory as the PACKAGE package"""
+    if PACKAGE not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+        spec.submodule_search_locations = [CONNECTOR_DIR]
+        sys.modules[PACKAGE] = importlib.util.module_from_spec(spec)
+    return sys.modules[PACKAGE]
+
+
+def connector_module(name):
+    """Returns a module of the connector, e.g. connector_module('isolate_host')"""
+    load_connector()
+    return importlib.import_module(f'{PACKAGE}.{name}')
+
+
+def mock_config(port, tls=False, **settings):
+    """Connector config for a mock PSM on port, with a state file id private to this run"""
+    config = {
+        'server_address': '127.0.0.1', 'port': port, 'username': 'bench', 'password': 'bench',
+        'tenant': TENANT, 'protocol': 'HTTPS' if tls else 'HTTP', 'verify_ssl': False,
+        'config_id': f'bench-{os.getpid()}', 'policy_name': POLICY_NAME
+    }
+    config.update(settings)
+    return config
+
+
+def remove_state_files():
+    """Delete the connector state files of this run's config_id"""
+    for filename in glob.glob(f'/tmp/*bench-{os.getpid()}*'):
+        os.remove(filename)
+
+
+class MockPSM():
+    """Threaded HTTP(S) server answering the PSM endpoints the connector uses.
+       Counts requests and new client connections (TLS handshakes with tls=True).
+    """
+
+    def __init__(self, rules=None, lists=None, tls=False):
+        self.policy = {
+            'kind': 'NetworkSecurityPolicy',
+            'meta': {'name': POLICY_NAME, 'tenant': TENANT, 'resource-version': '1'},
+            'spec': {'attach-tenant': True, 'rules': list(rules or [])}
+        }
+        # list endpoint path -> items
+        self.lists = dict(lists or {})
+        self.lock = threading.Lock()
+        self.requests = []
+        # connections opened since reset_counters, and every connection ever seen
+        self.new_connections = set()
+        self.connections = set()
+        self.logins = 0
+        self.tls = tls
+        self.cert_dir = None
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.server.daemon_threads = True
+        if tls:
+            self.wrap_tls()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def wrap_tls(self):
+        import ssl
+        self.cert_dir = tempfile.mkdtemp(prefix='psm_bench_')
+        cert, key = os.path.join(self.cert_dir, 'cert.pem'), os.path.join(self.cert_dir, 'key.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+             '-keyout', key, '-out', cert], check=True, capture_output=True
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+
+    def config(self, **settings):
+        """Connector config for this server"""
+        return mock_config(self.server.server_address[1], self.tls, **settings)
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests.clear()
+            self.new_connections.clear()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.cert_dir:
+            shutil.rmtree(self.cert_dir, ignore_errors=True)
+        remove_state_files()
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # buffer each response into one write (flushed after every request). unbuffered,
+            # the headers and body go out separately and Nagle's algorithm with delayed
+            # ACKs adds ~40 ms to every request on a kept-alive connection.
+            wbufsize = -1
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length)) if length else None
+
+            def handle_request(self, method):
+                url = urlparse(self.path)
+                with mock.lock:
+                    if self.client_address not in mock.connections:
+                        mock.connections.add(self.client_address)
+                        mock.new_connections.add(self.client_address)
+                    mock.requests.append((method, url.path))
+                body = self.read_json()
+
+                if url.path == '/v1/login':
+                    with mock.lock:
+                        mock.logins += 1
+                        sid = f's{mock.logins}'
+                    expires = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 3600))
+                    return self.send_json(200, {}, {'Set-Cookie': f'sid={sid}; Path=/; Expires={expires}'})
+                if 'sid=' not in (self.headers.get('Cookie') or ''):
+                    return self.send_json(401, {'message': 'authentication required'})
+
+                if url.path == f'{POLICY_PATH}/{POLICY_NAME}':
+                    if method == 'PUT':
+                        with mock.lock:
+                            version = (body.get('meta') or {}).get('resource-version')
+                            if version and version != mock.policy['meta']['resource-version']:
+                                return self.send_json(409, {'message': 'resource-version conflict'})
+                            mock.policy['spec'] = body['spec']
+                            mock.policy['meta']['resource-version'] = str(int(mock.policy['meta']['resource-version']) + 1)
+                    return self.send_json(200, mock.policy)
+
+                if url.path == POLICY_PATH:
+                    return self.send_json(200, {'kind': 'NetworkSecurityPolicyList', 'items': [mock.policy]})
+
+                if url.path in mock.lists:
+                    query = parse_qs(url.query)
+                    items = mock.lists[url.path]
+                    start = int(query.get('from', ['1'])[0]) - 1
+                    count = int(query.get('max-results', [str(len(items))])[0])
+                    return self.send_json(200, {'kind': 'List', 'list-meta': {}, 'items': items[start:start + count]})
+
+                return self.send_json(404, {'message': f'{url.path} not found'})
+
+            def do_GET(self):
+                self.handle_request('GET')
+
+            def do_PUT(self):
+                self.handle_request('PUT')
+
+            def do_POST(self):
+                self.handle_request('POST')
+
+            def do_DELETE(self):
+                self.handle_request('DELETE')
+
+        return Handler
@@ -0,0 +1,65 @@
+"""asyncio client for fan-out PSM requests"""
+
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from connectors.core.connector import get_logger
+from .constants import LOGGER_NAME, ASYNC_CONCURRENCY
+from .utils import get_psm
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+class AsyncPSMClient():
+    """Runs blocking PSM calls such as invoke_rest_endpoint concurrently from asyncio.
+
+       Requests run on worker threads through the same pooled PensandoPSM as the
+       synchronous code, so they share its keep-alive connections, cookies and
+       single-flight re-login. A semaphore keeps at most concurrency requests in
+       flight; it should stay below the HTTP pool size (HTTP_POOL_MAXSIZE).
+    """
+
+    def __init__(self, config, concurrency=None):
+        self.config = config
+        self.concurrency = int(concurrency or config.get('max_concurrency') or ASYNC_CONCURRENCY)
+        self.semaphore = None
+        self.executor = None
+
+    async def __aenter__(self):
+        # created here so the semaphore belongs to the running loop
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        # log in once before fanning out instead of racing every worker to the login
+        await self.run(get_psm, self.config)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        self.semaphore = None
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking PSM call such as invoke_rest_endpoint or list_endpoint
+           on a worker thread once a concurrency slot is free
+        """
+        # carry context variables (e.g. the transfer accounting scope) to the worker thread
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+
+def run_sync(coroutine):
+    """Runs a coroutine to completion from synchronous code, e.g. an operation function"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # called from inside a running loop - run ours on a separate thread, keeping the
+    # operation deadline and transfer/metrics scope of the caller
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(context.run, asyncio.run, coroutine).result()
+
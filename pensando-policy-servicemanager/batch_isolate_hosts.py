@@ -0,0 +1,53 @@
+"""batch_isolate_hosts operation"""
+
+import ipaddress
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+from .utils import normalize_list_input
+from .policy import PolicyTransaction
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def batch_isolate_hosts(config, params):
+    """Will create two NetworkSecurityPolicy rules per host under an existing Policy,
+       the same rules isolate_host creates, for a list of hosts. The policy is
+       fetched once and written once regardless of the number of hosts.
+
+       Returns a per-host result along with the PUT response.
+    """
+    host_source_ips = normalize_list_input(params.get('host_source_ips'))
+
+    if not host_source_ips:
+        logger.exception('Host IPs field is required but blank.')
+        raise ConnectorError('Host IPs field is required but blank.')
+
+    results = {}
+    valid_ips = []
+    for host_source_ip in dict.fromkeys(host_source_ips):
+        try:
+            ipaddress.ip_network(host_source_ip, strict=False)
+            valid_ips.append(host_source_ip)
+        except ValueError:
+            results[host_source_ip] = {'host_source_ip': host_source_ip, 'status': 'failed', 'message': 'Invalid IP address'}
+
+    if not valid_ips:
+        logger.exception('No valid host IPs to isolate. Rule update aborted.')
+        raise ConnectorError('No valid host IPs to isolate. Rule update aborted.')
+
+    transaction = PolicyTransaction(config, params)
+
+    # one pass over the rules for all hosts, replacing existing isolation rules
+    replaced = transaction.isolate_many(valid_ips)
+    for host_source_ip in valid_ips:
+        message = 'Existing isolation rules replaced' if replaced[host_source_ip] else 'Isolation rules created'
+        results[host_source_ip] = {'host_source_ip': host_source_ip, 'status': 'isolated', 'message': message}
+
+    logger.info(f'Isolating {len(valid_ips)} hosts')
+    policy = transaction.commit()
+
+    # results in input order
+    results = [results[host_source_ip] for host_source_ip in dict.fromkeys(host_source_ips)]
+
+    return {'results': results, 'policy': policy}
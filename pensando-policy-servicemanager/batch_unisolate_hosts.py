@@ -0,0 +1,47 @@
+"""batch_unisolate_hosts operation"""
+
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+from .utils import normalize_list_input
+from .policy import PolicyTransaction
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def batch_unisolate_hosts(config, params):
+    """Will delete the two isolation NetworkSecurityPolicy rules of every host in
+       a list. The policy is fetched once and written once regardless of the
+       number of hosts. Hosts without isolation rules are reported and skipped.
+
+       Returns a per-host result along with the PUT response.
+    """
+    host_source_ips = normalize_list_input(params.get('host_source_ips'))
+
+    if not host_source_ips:
+        logger.exception('Host IPs field is required but blank.')
+        raise ConnectorError('Host IPs field is required but blank.')
+
+    transaction = PolicyTransaction(config, params)
+
+    # one pass over the rules for all hosts
+    errors = transaction.unisolate_many(list(dict.fromkeys(host_source_ips)))
+
+    results = []
+    for host_source_ip, error in errors.items():
+        if error:
+            logger.warning(f'{host_source_ip}: {error}')
+            results.append({'host_source_ip': host_source_ip, 'status': 'failed', 'message': str(error)})
+        else:
+            results.append({'host_source_ip': host_source_ip, 'status': 'unisolated', 'message': 'Isolation rules removed'})
+
+    unisolated = [result for result in results if result['status'] == 'unisolated']
+    if not unisolated:
+        # nothing changed - skip the write
+        logger.info('No isolation rules matched. NetworkSecurityPolicy not updated.')
+        return {'results': results, 'policy': None}
+
+    logger.info(f'Unisolating {len(unisolated)} hosts')
+    policy = transaction.commit()
+
+    return {'results': results, 'policy': policy}
@@ -16,6 +16,12 @@ from .unisolate_host import unisolate_host
 from .ioc_block_add_ip import ioc_block_add_ip
 from .ioc_block_remove_ip import ioc_block_remove_ip
 from .ioc_delete_list import ioc_delete_list
+from .batch_isolate_hosts import batch_isolate_hosts
+from .batch_unisolate_hosts import batch_unisolate_hosts
+from .find_rules_for_ip import find_rules_for_ip
+from .get_inventory import get_inventory
+from .lookup_ip import lookup_ip
+from .get_metrics import get_metrics
  
 supported_operations = {
     "debug_remove_session_state": debug_remove_session_state,
@@ -34,5 +40,11 @@ supported_operations = {
     "unisolate_host": unisolate_host,
     "ioc_block_add_ip": ioc_block_add_ip,
     "ioc_block_remove_ip": ioc_block_remove_ip,
-    "ioc_delete_list": ioc_delete_list
+    "ioc_delete_list": ioc_delete_list,
+    "batch_isolate_hosts": batch_isolate_hosts,
+    "batch_unisolate_hosts": batch_unisolate_hosts,
+    "find_rules_for_ip": find_rules_for_ip,
+    "get_inventory": get_inventory,
+    "lookup_ip": lookup_ip,
+    "get_metrics": get_metrics
 }
@@ -0,0 +1,160 @@
+"""Circuit breaker for an unhealthy PSM, shared by all worker processes
+
+Each process keeps a rolling window of its own request outcomes. When the
+failure rate (errors, 429/5xx responses and slow calls) crosses the threshold
+the process opens the circuit in a shared state file under TMP_FILE_ROOT, and
+every process then fails fast. After the cool-down one request is let through
+as a half-open probe: success closes the circuit, failure opens it again.
+Processes re-read the state file only when its mtime changes.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import (
+    LOGGER_NAME, CIRCUIT_BREAKER_FILE, CIRCUIT_BREAKER_WINDOW, CIRCUIT_BREAKER_MIN_CALLS,
+    CIRCUIT_BREAKER_FAILURE_RATE, CIRCUIT_BREAKER_COOLDOWN, CIRCUIT_BREAKER_SLOW_CALL
+)
+from .state_store import StateStore
+from .metrics import inc
+
+
+logger = get_logger(LOGGER_NAME)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# state id -> CircuitBreaker
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(ConnectorError):
+    """Raised instead of sending a request while the circuit is open"""
+
+
+class CircuitBreaker():
+    """Open, half-open and closed circuit for one connector config"""
+
+    def __init__(self, state_id):
+        self.store = StateStore(state_id, CIRCUIT_BREAKER_FILE)
+        self.lock = threading.Lock()
+        # (time, failed) outcomes of this process's requests within the window
+        self.samples = deque()
+        self.shared = {'state': CLOSED}
+        self.shared_mtime = None
+        # set on the thread that sends the half-open probe
+        self.probe = threading.local()
+
+    @staticmethod
+    def settings(config):
+        return (
+            float(config.get('circuit_breaker_cooldown') or CIRCUIT_BREAKER_COOLDOWN),
+            float(config.get('circuit_breaker_slow_call') or CIRCUIT_BREAKER_SLOW_CALL)
+        )
+
+    def state(self):
+        """Returns the shared state, re-reading the file only if it changed"""
+        try:
+            mtime = os.stat(self.store.state_filename).st_mtime_ns
+        except FileNotFoundError:
+            return {'state': CLOSED}
+
+        if mtime != self.shared_mtime:
+            self.shared = self.store.load() or {'state': CLOSED}
+            self.shared_mtime = mtime
+        return self.shared
+
+    def _save(self, state):
+        self.store.save(state)
+        self.shared = state
+        self.shared_mtime = os.stat(self.store.state_filename).st_mtime_ns
+
+    def before_call(self, config):
+        """Raises CircuitOpenError unless a request may be sent now"""
+        state = self.state()
+        if state['state'] == CLOSED or getattr(self.probe, 'active', False):
+            return
+
+        cooldown, _ = self.settings(config)
+        now = time.time()
+        if now - state.get('changed_at', 0) >= cooldown:
+            # open long enough, or a half-open probe that never reported back
+            with self.store.lock():
+                current = self.store.load() or {'state': CLOSED}
+                if current['state'] == CLOSED:
+                    return
+                if now - current.get('changed_at', 0) >= cooldown:
+                    self._save({'state': HALF_OPEN, 'changed_at': now, 'reason': current.get('reason')})
+                    self.probe.active = True
+                    logger.warning('Circuit breaker half-open: sending a probe request')
+                    return
+                state = current
+
+        inc('circuit_rejections')
+        retry_in = max(cooldown - (now - state.get('changed_at', 0)), 0)
+        raise CircuitOpenError(
+            f'PSM circuit breaker is {state["state"]} ({state.get("reason")}). '
+            f'Failing fast - retry in {retry_in:.0f}s.'
+        )
+
+    def record(self, config, failed, latency):
+        """Record a request outcome and open or close the circuit if needed"""
+        _, slow_call = self.settings(config)
+        failed = failed or latency > slow_call
+        now = time.time()
+
+        if getattr(self.probe, 'active', False):
+            self.probe.active = False
+            with self.store.lock():
+                if failed:
+                    self._save({'state': OPEN, 'changed_at': now, 'reason': 'half-open probe failed'})
+                    logger.warning('Circuit breaker open: half-open probe failed')
+                else:
+                    self._save({'state': CLOSED, 'changed_at': now})
+                    logger.info('Circuit breaker closed: half-open probe succeeded')
+            with self.lock:
+                self.samples.clear()
+            return
+
+        with self.lock:
+            self.samples.append((now, failed))
+            while self.samples and now - self.samples[0][0] > CIRCUIT_BREAKER_WINDOW:
+                self.samples.popleft()
+            calls = len(self.samples)
+            failures = sum(1 for _, sample_failed in self.samples if sample_failed)
+
+        if not failed or calls < CIRCUIT_BREAKER_MIN_CALLS or failures / calls < CIRCUIT_BREAKER_FAILURE_RATE:
+            return
+
+        with self.store.lock():
+            current = self.store.load() or {'state': CLOSED}
+            if current['state'] == CLOSED:
+                reason = f'{failures} of the last {calls} requests failed or were slow'
+                self._save({'state': OPEN, 'changed_at': now, 'reason': reason})
+                logger.warning(f'Circuit breaker open: {reason}')
+        with self.lock:
+            self.samples.clear()
+
+    def report(self):
+        """Returns the shared state and this process's window counters"""
+        state = dict(self.state())
+        with self.lock:
+            state['window_calls'] = len(self.samples)
+            state['window_failures'] = sum(1 for _, failed in self.samples if failed)
+        return state
+
+
+def get_breaker(config, state_id):
+    """Returns the process-wide breaker for a config, or None if it is disabled"""
+    if config.get('circuit_breaker') is False:
+        return None
+
+    with _breakers_lock:
+        breaker = _breakers.get(state_id)
+        if breaker is None:
+            breaker = _breakers[state_id] = CircuitBreaker(state_id)
+        return breaker
@@ -3,6 +3,9 @@ from django.utils.module_loading import import_string
 from .builtins import *
 from .constants import LOGGER_NAME
 from .health_check import health_check
+from .transfer import operation_scope
+from .deadline import deadline_scope
+from .metrics import export_metrics
 
 
 logger = get_logger(LOGGER_NAME)
@@ -22,7 +25,11 @@ class PensandoPSMConnector(Connector):
     def execute(self, config, operation, params, *args, **kwargs):
         # returning dev_execute during development
         # return self.dev_execute(config, operation, params)
-        return supported_operations.get(operation)(config, params)
+        try:
+            with operation_scope(operation), deadline_scope(config):
+                return supported_operations.get(operation)(config, params)
+        finally:
+            export_metrics(config)
 
     def check_health(self, config=None, *args, **kwargs):
         return health_check(config, *args, **kwargs)
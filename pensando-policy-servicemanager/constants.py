@@ -1,5 +1,57 @@
 LOGGER_NAME = 'pensando-policy-servicemanager'
 TMP_FILE_ROOT = '/tmp'
-PSM_SESSION_FILE = f'{LOGGER_NAME}_state_session'
-PSM_COOKIE_EXP_FILE = f'{LOGGER_NAME}_state_cookie_expiration'
+PSM_STATE_FILE = f'{LOGGER_NAME}_state'
 SENTINEL_IP = '192.0.2.42'
+IOC_LIST_MAX = 900
+IOC_SHARDS = 1
+IOC_SHARDS_MAX = 255
+# RFC 5737 TEST-NET-2 addresses tag IOC Block rule pairs 1..254
+IOC_SHARD_SENTINEL_PREFIX = '198.51.100.'
+SESSION_POOL_SIZE = 8
+SESSION_IDLE_TIMEOUT = 300
+HTTP_POOL_MAXSIZE = 10
+SESSION_REFRESH_WINDOW = 300
+POLICY_NAME_TTL = 600
+POLICY_WRITE_RETRIES = 5
+POLICY_WRITE_BACKOFF = 0.1
+POLICY_CONFLICT_STATUS_CODES = (409, 412)
+LIST_PAGE_SIZE = 500
+ALERTS_WATERMARK_FILE = f'{LOGGER_NAME}_alerts_watermark'
+STREAM_CHUNK_SIZE = 65536
+ACCEPT_ENCODING = 'gzip, deflate'
+REQUEST_COMPRESS_MIN_SIZE = 16384
+ASYNC_CONCURRENCY = 8
+ENRICHMENT_TTL = 300
+# MB of response bodies kept by the conditional GET cache. 0 disables it.
+RESPONSE_CACHE_SIZE = 32
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+OPERATION_DEADLINE = 300
+REQUEST_RETRIES = 2
+REQUEST_RETRY_BACKOFF = 0.5
+# methods resent after any retryable error. others (PUT, DELETE, POST) may already have
+# been applied, so they are only resent when PSM cannot have processed them.
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+# status codes PSM answers without processing the request
+UNPROCESSED_STATUS_CODES = (429, 503)
+CIRCUIT_BREAKER_FILE = f'{LOGGER_NAME}_circuit'
+# rolling window (seconds), minimum calls in it and failure rate that open the circuit
+CIRCUIT_BREAKER_WINDOW = 60
+CIRCUIT_BREAKER_MIN_CALLS = 10
+CIRCUIT_BREAKER_FAILURE_RATE = 0.5
+CIRCUIT_BREAKER_COOLDOWN = 30
+CIRCUIT_BREAKER_SLOW_CALL = 10
+METRICS_PREFIX = 'pensando_psm'
+# minimum seconds between two writes of the metrics textfile by one process
+METRICS_EXPORT_INTERVAL = 15
+# policy payloads are logged as summaries of at most this many characters
+LOG_PAYLOAD_MAX_CHARS = 2048
+# policies with at most this many rules also have their rules in the summary
+LOG_PAYLOAD_INLINE_RULES = 10
+IOC_QUEUE_FILE = f'{LOGGER_NAME}_ioc_queue'
+IOC_RESULTS_FILE = f'{LOGGER_NAME}_ioc_results'
+# seconds between checks for the outcome of a queued IOC change
+IOC_QUEUE_POLL = 0.02
+# seconds a published IOC change outcome is kept for its caller
+IOC_RESULT_TTL = 600
@@ -0,0 +1,69 @@
+"""Operation deadlines, request timeouts and retry backoff"""
+
+import time
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME, CONNECT_TIMEOUT, READ_TIMEOUT, OPERATION_DEADLINE, REQUEST_RETRY_BACKOFF
+
+
+logger = get_logger(LOGGER_NAME)
+
+# monotonic time by which the running operation must finish. a context variable so
+# AsyncPSMClient worker threads share the deadline of the operation that started them.
+_deadline = ContextVar('operation_deadline', default=None)
+
+
+class DeadlineExceeded(ConnectorError):
+    """Raised when an operation runs out of its time budget"""
+
+
+@contextmanager
+def deadline_scope(config):
+    """Start an operation_deadline second budget, unless one is already running.
+       The login, the request and any retries all draw on the same budget.
+    """
+    if _deadline.get() is not None:
+        yield
+        return
+
+    seconds = float(config.get('operation_deadline') or OPERATION_DEADLINE)
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the deadline, or None outside a deadline scope"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def request_timeout(config):
+    """Returns the (connect, read) timeout for the next request, cut to the time left.
+       Raises DeadlineExceeded if there is none left.
+    """
+    connect = float(config.get('connect_timeout') or CONNECT_TIMEOUT)
+    read = float(config.get('read_timeout') or READ_TIMEOUT)
+
+    left = remaining()
+    if left is None:
+        return connect, read
+
+    if left <= 0:
+        logger.exception('Operation deadline exceeded')
+        raise DeadlineExceeded('Operation deadline exceeded')
+
+    return min(connect, left), min(read, left)
+
+
+def backoff(attempt):
+    """Sleep a full jitter exponential backoff before retry attempt (1 based), never past the deadline"""
+    delay = random.uniform(0, REQUEST_RETRY_BACKOFF * 2 ** (attempt - 1))
+    left = remaining()
+    if left is not None:
+        delay = min(delay, max(left, 0))
+    time.sleep(delay)
@@ -2,12 +2,13 @@
 
 from connectors.core.connector import get_logger
 from .constants import LOGGER_NAME
-from .utils import PensandoPSM
+from .utils import PensandoPSM, release_psm
 
 
 logger = get_logger(LOGGER_NAME)
 
 
 def debug_reset_session_state(config, params):
+    release_psm(config)
     psm = PensandoPSM(config)
     psm._debug_reset_session_state()
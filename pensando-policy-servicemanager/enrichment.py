@@ -0,0 +1,269 @@
+"""Cached IP and MAC to workload, host and DSC enrichment index"""
+
+import re
+import time
+import ipaddress
+import asyncio
+import threading
+from connectors.core.connector import get_logger
+from .constants import LOGGER_NAME, ENRICHMENT_TTL
+from .async_client import AsyncPSMClient, run_sync
+from .projection import compile_projection
+from .utils import iterate_list_items, config_fingerprint
+from .metrics import inc, inc_many, observe, totals
+
+
+logger = get_logger(LOGGER_NAME)
+
+# collection -> (endpoint, fields kept while streaming the list)
+SOURCES = {
+    'workloads': (
+        '/configs/workload/v1/workloads',
+        'meta.name, meta.tenant, meta.namespace, spec.host-name, spec.interfaces, status.interfaces'
+    ),
+    'hosts': ('/configs/cluster/v1/hosts', 'meta.name, spec.dscs'),
+    'distributedservicecards': (
+        '/configs/cluster/v1/distributedservicecards',
+        'meta.name, spec.id, status.primary-mac, status.host, status.ip-config, status.admission-phase'
+    )
+}
+
+MAC_SEPARATORS = re.compile(r'[.:\-]')
+
+# config fingerprint -> IndexHolder
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize_mac(address):
+    """Returns address in PSM's aaaa.bbbb.cccc MAC format, or None if it is not a MAC address"""
+    digits = MAC_SEPARATORS.sub('', address or '').lower()
+    if len(digits) != 12 or not all(c in '0123456789abcdef' for c in digits):
+        return None
+    return '.'.join(digits[i:i + 4] for i in range(0, 12, 4))
+
+
+def parse_ip(address):
+    """Returns the canonical form of an IP address, ignoring a prefix length (10.1.1.1/24),
+       or None if it is not an IP address
+    """
+    try:
+        return str(ipaddress.ip_address((address or '').split('/')[0].strip()))
+    except ValueError:
+        return None
+
+
+def strip_prefix(address):
+    """Interface addresses may carry a prefix length (10.1.1.1/24) - index the address,
+       in canonical form if it parses as an IP address
+    """
+    return parse_ip(address) or (address or '').split('/')[0]
+
+
+class EnrichmentIndex():
+    """Maps interface IPs and MACs to their workload, host and DSC.
+       Built in one pass over the workload, host and DSC lists.
+    """
+
+    def __init__(self, workloads, hosts, dscs):
+        self.built_at = time.time()
+        self.by_ip = {}
+        self.by_mac = {}
+
+        dscs_by_key = {}
+        dscs_by_host = {}
+        for dsc in dscs:
+            summary = self._dsc_summary(dsc)
+            for key in (summary['name'], summary['id'], summary['primary-mac']):
+                if key:
+                    dscs_by_key[key] = summary
+            if summary['host']:
+                dscs_by_host.setdefault(summary['host'], []).append(summary)
+            if summary['ip-address']:
+                self.by_ip.setdefault(strip_prefix(summary['ip-address']), []).append({'type': 'dsc', 'dsc': summary})
+
+        # hosts list their DSCs by id or MAC. fills in DSCs that do not report their host.
+        for host in hosts:
+            host_name = (host.get('meta') or {}).get('name')
+            for reference in (host.get('spec') or {}).get('dscs') or []:
+                dsc = dscs_by_key.get(reference.get('id')) or dscs_by_key.get(normalize_mac(reference.get('mac-address')))
+                if dsc and dsc not in dscs_by_host.get(host_name, []):
+                    dscs_by_host.setdefault(host_name, []).append(dsc)
+
+        for workload in workloads:
+            meta = workload.get('meta') or {}
+            spec = workload.get('spec') or {}
+            host_name = spec.get('host-name')
+            interfaces = (spec.get('interfaces') or []) + ((workload.get('status') or {}).get('interfaces') or [])
+
+            for interface in interfaces:
+                mac = normalize_mac(interface.get('mac-address'))
+                entry = {
+                    'type': 'workload',
+                    'workload': meta.get('name'),
+                    'tenant': meta.get('tenant'),
+                    'namespace': meta.get('namespace'),
+                    'host': host_name,
+                    'interface': interface,
+                    'dscs': dscs_by_host.get(host_name, [])
+                }
+                for ip in interface.get('ip-addresses') or []:
+                    self._add(self.by_ip, strip_prefix(ip), entry)
+                if mac:
+                    self._add(self.by_mac, mac, entry)
+
+    @staticmethod
+    def _dsc_summary(dsc):
+        meta = dsc.get('meta') or {}
+        spec = dsc.get('spec') or {}
+        status = dsc.get('status') or {}
+        return {
+            'name': meta.get('name'),
+            'id': spec.get('id'),
+            'primary-mac': normalize_mac(status.get('primary-mac')),
+            'host': status.get('host'),
+            'ip-address': (status.get('ip-config') or {}).get('ip-address'),
+            'admission-phase': status.get('admission-phase')
+        }
+
+    @staticmethod
+    def _add(mapping, key, entry):
+        # spec and status often list the same interface - keep one entry per workload
+        entries = mapping.setdefault(key, [])
+        if not any(existing['workload'] == entry['workload'] for existing in entries if existing['type'] == 'workload'):
+            entries.append(entry)
+
+    def lookup(self, address):
+        """Returns the entries for an IP or MAC address"""
+        # IP first - 12 hex digits once separators are dropped (192.168.100.101, ::aabb:ccdd:eeff)
+        # would also pass as a MAC address
+        ip = parse_ip(address)
+        if ip:
+            return self.by_ip.get(ip, [])
+        mac = normalize_mac(address)
+        if mac:
+            return self.by_mac.get(mac, [])
+        return self.by_ip.get(strip_prefix(address), [])
+
+    def size(self):
+        return {'ip_addresses': len(self.by_ip), 'mac_addresses': len(self.by_mac)}
+
+
+def fetch_sources(config):
+    """Streams the workload, host and DSC lists concurrently, keeping only indexed fields"""
+    def collect(endpoint, fields):
+        return list(iterate_list_items(config, endpoint, projection=compile_projection(fields)))
+
+    async def fetch_all():
+        async with AsyncPSMClient(config) as client:
+            return await asyncio.gather(*(client.run(collect, *source) for source in SOURCES.values()))
+
+    return run_sync(fetch_all())
+
+
+class IndexHolder():
+    """The current index for one config and its refresh state. Lookups and refreshes
+       are counted in metrics as enrichment_* counters and the enrichment_refresh span.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.refreshing = False
+        self.last_refresh_seconds = None
+        self.last_refresh_error = None
+
+    def age(self):
+        return time.time() - self.index.built_at if self.index else None
+
+    def refresh(self, config):
+        """Rebuild the index. Errors keep the previous index and are recorded as last_refresh_error."""
+        start = time.perf_counter()
+        try:
+            index = EnrichmentIndex(*fetch_sources(config))
+
+        except Exception as ex:
+            logger.exception(f'Enrichment index refresh failed: {ex}')
+            inc('enrichment_refresh_errors')
+            with self.lock:
+                self.last_refresh_error = str(ex)
+                self.refreshing = False
+            raise
+
+        seconds = time.perf_counter() - start
+        inc('enrichment_refreshes')
+        observe('enrichment_refresh', seconds)
+        with self.lock:
+            self.index = index
+            self.refreshing = False
+            self.last_refresh_seconds = round(seconds, 3)
+            self.last_refresh_error = None
+        logger.info(f'Enrichment index refreshed in {seconds:.3f}s: {index.size()}')
+
+    def refresh_in_background(self, config):
+        """Start a background rebuild unless one is already running"""
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh(config)
+            except Exception:
+                # logged and counted by refresh. lookups keep using the previous index.
+                pass
+
+        threading.Thread(target=run, name='psm-enrichment-refresh', daemon=True).start()
+
+
+def get_index_holder(config):
+    key = config_fingerprint(config)
+    with _indexes_lock:
+        return _indexes.setdefault(key, IndexHolder())
+
+
+def lookup_address(config, address, force_refresh=False):
+    """Looks up an IP or MAC address in the enrichment index for config.
+       The first lookup (or force_refresh) builds the index synchronously. After
+       enrichment_ttl seconds lookups are still answered from memory while the
+       index is rebuilt in the background.
+    """
+    holder = get_index_holder(config)
+    ttl = config.get('enrichment_ttl')
+    ttl = int(ttl if ttl not in (None, '') else ENRICHMENT_TTL)
+
+    if holder.index is None or force_refresh:
+        with holder.build_lock:
+            # concurrent first lookups wait for one build
+            if holder.index is None or force_refresh:
+                holder.refresh(config)
+
+    age = holder.age()
+    stale = age > ttl
+    if stale:
+        holder.refresh_in_background(config)
+
+    matches = holder.index.lookup(address)
+    inc_many({'enrichment_hits' if matches else 'enrichment_misses': 1, 'enrichment_stale_lookups': int(stale)})
+
+    # process-wide counters, plus the refresh state of this config's index
+    stats = dict.fromkeys(('hits', 'misses', 'stale_lookups', 'refreshes', 'refresh_errors'), 0)
+    stats.update(totals('enrichment_'))
+    with holder.lock:
+        stats['last_refresh_seconds'] = holder.last_refresh_seconds
+        stats['last_refresh_error'] = holder.last_refresh_error
+
+    return {
+        'address': address,
+        'found': bool(matches),
+        'matches': matches,
+        'index': {
+            'age': round(age, 3),
+            'ttl': ttl,
+            'stale': stale,
+            'size': holder.index.size(),
+            'stats': stats
+        }
+    }
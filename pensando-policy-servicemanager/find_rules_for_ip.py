@@ -0,0 +1,43 @@
+"""find_rules_for_ip operation"""
+
+import ipaddress
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+from .policy import PolicyTransaction
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def find_rules_for_ip(config, params):
+    """Returns the NetworkSecurityPolicy rules that affect an IP address: rules
+       that list it, a CIDR containing it or 'any', in either the from or to
+       addresses. Each match has the rule position, the role the address plays
+       ('from' or 'to'), the matching address and the rule itself.
+
+       Matches through 0.0.0.0/0, ::/0 and 'any' are only returned if
+       include_catch_all is set.
+    """
+    ip = params.get('ip')
+    include_catch_all = params.get('include_catch_all', False)
+
+    if not ip:
+        logger.exception('IP field is required but blank.')
+        raise ConnectorError('IP field is required but blank.')
+
+    try:
+        ipaddress.ip_network(ip, strict=False)
+    except ValueError:
+        logger.exception(f'Invalid IP address: {ip}')
+        raise ConnectorError(f'Invalid IP address: {ip}')
+
+    transaction = PolicyTransaction(config, params)
+    matches = transaction.index().rules_for_ip(ip, include_catch_all)
+    for match in matches:
+        match['rule'] = transaction.rules[match['index']]
+
+    return {
+        'ip': ip,
+        'policy_name': transaction.policy_name,
+        'rules': matches
+    }
@@ -1,15 +1,112 @@
 """get_alerts operation"""
 
+import re
+from datetime import datetime, timezone
 from connectors.core.connector import get_logger
-from .constants import LOGGER_NAME
-from .utils import invoke_rest_endpoint
+from .constants import LOGGER_NAME, LIST_PAGE_SIZE, ALERTS_WATERMARK_FILE
+from .state_store import StateStore
+from .utils import list_endpoint, iterate_list_items, state_id
+from .projection import compile_projection, project
 
 
 logger = get_logger(LOGGER_NAME)
 
+ALERTS_ENDPOINT = '/configs/monitoring/v1/alerts'
+
+TIMESTAMP_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:\d{2})?$')
+
+
+def timestamp_key(value):
+    """Returns a sortable (seconds, nanoseconds) key for a PSM RFC3339 timestamp.
+       PSM reports nanoseconds, which datetime cannot hold and which do not
+       compare correctly as strings.
+    """
+    match = TIMESTAMP_PATTERN.match(value or '')
+    if not match:
+        return None
+
+    seconds, fraction, offset = match.groups()
+    offset = '+00:00' if offset in (None, 'Z') else offset
+    moment = datetime.fromisoformat(f'{seconds}{offset}').astimezone(timezone.utc)
+    return int(moment.timestamp()), int((fraction or '0')[:9].ljust(9, '0'))
+
+
+def alert_meta(alert):
+    """Returns (creation key, name) of an alert"""
+    meta = alert.get('meta') or {}
+    return timestamp_key(meta.get('creation-time')), meta.get('name')
+
+
+def batched(items, batch_size):
+    """Splits items into lists of at most batch_size items"""
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def get_new_alerts(config, params):
+    """Returns only the alerts created since the previous incremental call for this config.
+
+       Alerts are requested newest first and paging stops at the first alert
+       older than the saved high-water mark, so each call fetches about as
+       many alerts as are new. The mark is the newest creation-time seen plus
+       the names of the alerts created at that instant, so alerts sharing a
+       timestamp are neither skipped nor returned twice.
+
+       limit caps the alerts returned per call, not the alerts read: the oldest
+       limit new alerts are returned and the mark only advances to the newest of
+       them, so the rest are returned by the following calls.
+    """
+    page_size = int(params.get('page_size') or LIST_PAGE_SIZE)
+    limit = int(params.get('limit') or 0) or None
+    batch_size = int(params.get('batch_size') or 0)
+    # the watermark needs meta, so the projection is applied after it is updated
+    projection = compile_projection(params.get('fields'))
+
+    store = StateStore(state_id(config), ALERTS_WATERMARK_FILE)
+    with store.lock():
+        watermark = store.load() or {}
+        mark = timestamp_key(watermark.get('creation-time'))
+        seen = set(watermark.get('names') or [])
+
+        new_alerts = []
+        query = {'sort-order': 'by-creation-time-reverse'}
+        for alert in iterate_list_items(config, ALERTS_ENDPOINT, page_size, None, query):
+            created, name = alert_meta(alert)
+            if mark is not None and created is not None:
+                if created < mark:
+                    break
+                if created == mark and name in seen:
+                    continue
+            new_alerts.append(alert)
+
+        # return oldest first so records are created in the order the alerts were raised
+        new_alerts.reverse()
+        if limit and len(new_alerts) > limit:
+            logger.info(f'{len(new_alerts) - limit} new alerts left for the next incremental poll')
+            new_alerts = new_alerts[:limit]
+
+        dated = [(alert_meta(alert), alert) for alert in new_alerts if alert_meta(alert)[0] is not None]
+        if dated:
+            (newest_key, _), newest = max(dated, key=lambda entry: entry[0][0])
+            names = {name for (created, name), _ in dated if created == newest_key}
+            if newest_key == mark:
+                names |= seen
+            watermark = {'creation-time': newest['meta']['creation-time'], 'names': sorted(names)}
+            store.save(watermark)
+
+    logger.info(f'Incremental alert poll: {len(new_alerts)} new alerts')
+    new_alerts = project(new_alerts, projection)
+    result = {'kind': 'AlertList', 'items': new_alerts, 'watermark': watermark}
+    if batch_size > 0:
+        result['batches'] = batched(new_alerts, batch_size)
+    return result
+
 
 def get_alerts(config, params):
-    """Get Pensando alerts"""
-    endpoint = '/configs/monitoring/v1/alerts'
-    api_response = invoke_rest_endpoint(config, endpoint, 'GET')
+    """Get Pensando alerts. Fetched page_size items at a time, up to limit items if set.
+       With incremental set, only alerts newer than the saved watermark are returned.
+    """
+    if params.get('incremental'):
+        return get_new_alerts(config, params)
+
+    api_response = list_endpoint(config, ALERTS_ENDPOINT, params)
     return api_response
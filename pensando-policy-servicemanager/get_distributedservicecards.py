@@ -2,14 +2,14 @@
 
 from connectors.core.connector import get_logger
 from .constants import LOGGER_NAME
-from .utils import invoke_rest_endpoint
+from .utils import list_endpoint
 
 
 logger = get_logger(LOGGER_NAME)
 
 
 def get_distributedservicecards(config, params):
-    """Get Pensando distributed service cards"""
+    """Get Pensando distributed service cards. Fetched page_size items at a time, up to limit items if set."""
     endpoint = '/configs/cluster/v1/distributedservicecards'
-    api_response = invoke_rest_endpoint(config, endpoint, 'GET')
+    api_response = list_endpoint(config, endpoint, params)
     return api_response
@@ -0,0 +1,69 @@
+"""get_inventory operation"""
+
+import time
+import asyncio
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+from .async_client import AsyncPSMClient, run_sync
+from .utils import normalize_list_input
+from .get_workloads import get_workloads
+from .get_networks import get_networks
+from .get_distributedservicecards import get_distributedservicecards
+from .get_network_security_policies import get_network_security_policies
+
+
+logger = get_logger(LOGGER_NAME)
+
+COLLECTIONS = {
+    'workloads': get_workloads,
+    'networks': get_networks,
+    'distributedservicecards': get_distributedservicecards,
+    'networksecuritypolicies': get_network_security_policies
+}
+# operation parameters passed through to every collection
+SHARED_PARAMS = ('tenant', 'page_size', 'limit')
+
+
+async def fetch_collections(config, collections, collection_params):
+    """Fetch the collections concurrently. Returns [(name, result, error, seconds)]."""
+    async def fetch(name):
+        start = time.perf_counter()
+        try:
+            result = await client.run(COLLECTIONS[name], config, collection_params)
+            return name, result, None, time.perf_counter() - start
+
+        except Exception as ex:
+            logger.exception(f'Inventory: error fetching {name}')
+            return name, None, str(ex), time.perf_counter() - start
+
+    async with AsyncPSMClient(config) as client:
+        return await asyncio.gather(*(fetch(name) for name in collections))
+
+
+def get_inventory(config, params):
+    """Fetch several PSM collections in parallel on one authenticated session.
+       A collection that fails is reported in errors and the others are still returned.
+    """
+    collections = normalize_list_input(params.get('collections')) or list(COLLECTIONS)
+    unknown = [name for name in collections if name not in COLLECTIONS]
+    if unknown:
+        logger.exception(f'Unknown inventory collections: {unknown}')
+        raise ConnectorError(f'Unknown inventory collections: {unknown}')
+
+    collection_params = {name: params.get(name) for name in SHARED_PARAMS if params.get(name)}
+
+    start = time.perf_counter()
+    fetched = run_sync(fetch_collections(config, collections, collection_params))
+    elapsed = time.perf_counter() - start
+
+    inventory = {'collections': {}, 'timings': {}, 'errors': {}}
+    for name, result, error, seconds in fetched:
+        inventory['timings'][name] = round(seconds, 3)
+        if error is None:
+            inventory['collections'][name] = result
+        else:
+            inventory['errors'][name] = error
+
+    inventory['elapsed'] = round(elapsed, 3)
+    logger.info(f'Inventory: fetched {len(inventory["collections"])} of {len(collections)} collections in {elapsed:.3f}s')
+    return inventory
@@ -0,0 +1,23 @@
+"""get_metrics operation"""
+
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+from .metrics import snapshot, export_prometheus
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def get_metrics(config, params):
+    """Returns the timing spans, counters and gauges recorded by this worker process,
+       as a JSON snapshot or in the Prometheus text format
+    """
+    output_format = (params.get('format') or 'JSON').lower()
+
+    if output_format == 'json':
+        return snapshot()
+    if output_format == 'prometheus':
+        return export_prometheus()
+
+    logger.exception(f'Unsupported metrics format: {output_format}')
+    raise ConnectorError(f'Unsupported metrics format: {output_format}')
@@ -2,14 +2,14 @@
 
 from connectors.core.connector import get_logger
 from .constants import LOGGER_NAME
-from .utils import invoke_rest_endpoint
+from .utils import list_endpoint, tenant_endpoint
 
 
 logger = get_logger(LOGGER_NAME)
 
 
 def get_network_security_policies(config, params):
-    """Get Pensando network security policies"""
-    endpoint = '/configs/security/v1/networksecuritypolicies'
-    api_response = invoke_rest_endpoint(config, endpoint, 'GET')
+    """Get Pensando network security policies, optionally scoped to a tenant and filtered by selectors"""
+    endpoint = tenant_endpoint('/configs/security/v1', 'networksecuritypolicies', params.get('tenant'))
+    api_response = list_endpoint(config, endpoint, params)
     return api_response
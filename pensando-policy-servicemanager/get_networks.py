@@ -2,14 +2,14 @@
 
 from connectors.core.connector import get_logger
 from .constants import LOGGER_NAME
-from .utils import invoke_rest_endpoint
+from .utils import list_endpoint, tenant_endpoint
 
 
 logger = get_logger(LOGGER_NAME)
 
 
 def get_networks(config, params):
-    """Get Pensando networks"""
-    endpoint = '/configs/network/v1/networks'
-    api_response = invoke_rest_endpoint(config, endpoint, 'GET')
+    """Get Pensando networks. Fetched page_size items at a time, up to limit items if set."""
+    endpoint = tenant_endpoint('/configs/network/v1', 'networks', params.get('tenant'))
+    api_response = list_endpoint(config, endpoint, params)
     return api_response
@@ -2,14 +2,14 @@
 
 from connectors.core.connector import get_logger
 from .constants import LOGGER_NAME
-from .utils import invoke_rest_endpoint
+from .utils import list_endpoint, tenant_endpoint
 
 
 logger = get_logger(LOGGER_NAME)
 
 
 def get_workloads(config, params):
-    """Get Pensando workloads"""
-    endpoint = '/configs/workload/v1/workloads'
-    api_response = invoke_rest_endpoint(config, endpoint, 'GET')
+    """Get Pensando workloads. Fetched page_size items at a time, up to limit items if set."""
+    endpoint = tenant_endpoint('/configs/workload/v1', 'workloads', params.get('tenant'))
+    api_response = list_endpoint(config, endpoint, params)
     return api_response
@@ -2,15 +2,37 @@
 
 from connectors.core.connector import get_logger
 from .constants import LOGGER_NAME
-from .utils import invoke_rest_endpoint
+from .utils import invoke_rest_endpoint, get_psm, state_id
+from .response_cache import response_cache
+from .circuit_breaker import get_breaker
 
 
 logger = get_logger(LOGGER_NAME)
 
 
 def health_check(config=None, *args, **kwargs):
-    """Get Pensando health check"""
+    """Get Pensando health check. Returns the circuit breaker state with the result.
+       While the circuit breaker is open this fails fast with the breaker state
+       instead of contacting PSM.
+    """
+    breaker = get_breaker(config, state_id(config))
+    if breaker:
+        logger.info(f'Circuit breaker: {breaker.report()}')
+
+    # also warms the pooled session so operations don't pay for the login
     auth_endpoint = '/configs/workload/v1/workloads'
     invoke_rest_endpoint(config, auth_endpoint, 'GET')
+    psm = get_psm(config)
+    if psm.last_refresh_latency is not None:
+        logger.info(f'Last session refresh took {psm.last_refresh_latency:.3f}s')
+    logger.info(f'Response cache: {response_cache.report()}')
     logger.info('Health Check succeeded')
-    return 'Connector is Available'
+    if not breaker:
+        return 'Connector is Available. Circuit breaker: disabled'
+
+    # reported after the request, which may have been the probe that closed the circuit
+    report = breaker.report()
+    return (
+        f'Connector is Available. Circuit breaker: {report["state"]}, '
+        f'{report["window_failures"]} of {report["window_calls"]} recent requests failed'
+    )
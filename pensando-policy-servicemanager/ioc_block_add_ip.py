@@ -1,10 +1,10 @@
 """ioc_block_add_ip operation"""
 
-from collections import deque
 from connectors.core.connector import get_logger, ConnectorError
-from .constants import LOGGER_NAME, SENTINEL_IP
-from .utils import invoke_rest_endpoint, normalize_list_input
-from .get_network_security_policies import get_network_security_policies
+from .constants import LOGGER_NAME
+from .utils import normalize_list_input
+from .policy import PolicyTransaction
+from .ioc_queue import IOCCommitQueue
 
 
 logger = get_logger(LOGGER_NAME)
@@ -20,6 +20,9 @@ def ioc_block_add_ip(config, params):
        address that should never be found in production traffic. This SENTINEL_IP
        allows us to identify IOC block rules so they can be modified or deleted.
 
+       With the ioc_shards config set above 1, the list is split across several
+       rule pairs. Pair N is tagged with IOC_SHARD_SENTINEL_PREFIX + N instead.
+
        Block IOC rules will always look like this:
 
        "spec": {
@@ -58,7 +61,6 @@ def ioc_block_add_ip(config, params):
          ]
        }
     """
-    tenant = config.get('tenant')
     ioc_ip = params.get('ioc_ip')
 
     # ioc_ip can be a comma separated string or a list object. Convert to list if a string.
@@ -68,109 +70,13 @@ def ioc_block_add_ip(config, params):
         logger.exception('IOC IP field is required but blank.')
         raise ConnectorError('IOC IP field is required but blank.')
 
-    # first query Pensando SVC Mgr to get the NetworkSecurityPolicy name
-    policy_name_result = get_network_security_policies(config, params)
-    policy_name = policy_name_result['items'][0]['meta']['name']
-    logger.info(f'policy name: {policy_name}')
-
-    # pull the network security policy
-    endpoint = f'/configs/security/v1/tenant/{tenant}/networksecuritypolicies/{policy_name}'
-    security_policy = invoke_rest_endpoint(config, endpoint, 'GET')
-    rules = security_policy['spec']['rules']
-    logger.info(f'rules: {rules}')
-
-    # find existing IOC Block rules
-    match_list = []
-    for index, rule in enumerate(rules):
-        if any(
-            (
-                SENTINEL_IP in rule.get('to-ip-addresses', ''),
-                SENTINEL_IP in rule.get('from-ip-addresses', '')
-            )
-        ):
-            match_list.append(index)
-
-    logger.info(f'rule matches: {match_list}')
-
-    # check length of match_list to see if there two or more matches. if not fail gracefully.
-    if len(match_list) == 1:
-        logger.exception('Expected two rules, but found one. Rule update aborted.')
-        raise ConnectorError('Expected two rules, but found one. Rule update aborted.')
-
-    existing_ioc_list = []
-
-    # ensure rules are contiguous
-    if match_list:
-        if match_list[1] != match_list[0] + 1:
-            logger.exception('Rules are not contiguous. Rule update aborted.')
-            raise ConnectorError('Rules are not contiguous. Rule update aborted.')
-
-        # grab the IOC list and run it through a dict to remove any duplicates.
-        # using dict.fromkeys instead of set to preserve order of IP addresses.
-        # using collections.deque to keep list to 900 items and FIFO old ones.
-        if SENTINEL_IP in rules[match_list[0]]['to-ip-addresses']:
-            existing_ioc_list = rules[match_list[0]]['to-ip-addresses']
-        else:
-            existing_ioc_list = rules[match_list[0]]['from-ip-addresses']
-
-        existing_ioc_list.remove(SENTINEL_IP)
-
-    ioc_ip = list(dict.fromkeys(ioc_ip))
-
-    new_ioc_list = list(dict.fromkeys(existing_ioc_list))
-    new_ioc_list.extend(ioc_ip)
-
-    ioc_list = deque(dict.fromkeys(new_ioc_list), maxlen=900)
-    ioc_list.append(SENTINEL_IP)
-    ioc_list = list(ioc_list)
-
-    # remove old rules
-    if match_list:
-        del rules[match_list[0]]
-        del rules[match_list[0]]
-
-    # add two IOC Block rules to the top of the NetworkSecurityPolicy
-    inbound_rule = {
-        "proto-ports": [
-            {
-                "protocol": "any",
-                "ports": ""
-            }
-        ],
-        "action": "deny",
-        "from-ip-addresses": [
-            "0.0.0.0/0"
-        ],
-        "to-ip-addresses": ioc_list
-    }
-
-    outbound_rule = {
-        "proto-ports": [
-            {
-                "protocol": "any",
-                "ports": ""
-            }
-        ],
-        "action": "deny",
-        "from-ip-addresses": ioc_list,
-        "to-ip-addresses": [
-            "0.0.0.0/0"
-        ]
-    }
-
-    rules.insert(0, inbound_rule)
-    rules.insert(0, outbound_rule)
-
-    new_security_policy = {
-        'kind': 'NetworkSecurityPolicy',
-        'api-version': 'v1',
-        'spec': {
-            'attach-tenant': True,
-            'rules': rules
-        }
-    }
+    # coalesce with concurrent IOC changes into a single policy write if enabled
+    coalesce_window = float(config.get('ioc_coalesce_window') or 0)
+    if coalesce_window > 0:
+        return IOCCommitQueue(config).submit('ioc_add', ioc_ip, coalesce_window)
 
-    logger.info(f'Updating NetworkSecurityPolicy {policy_name} with {new_security_policy}')
-    result = invoke_rest_endpoint(config, endpoint, 'PUT', new_security_policy)
+    transaction = PolicyTransaction(config, params)
+    transaction.ioc_add(ioc_ip)
+    result = transaction.commit()
 
     return result
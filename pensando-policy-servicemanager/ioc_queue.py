@@ -0,0 +1,221 @@
+"""Group commit queue for IOC blocklist changes
+
+IOC adds and removes that arrive within a short window for the same config
+are applied to one PolicyTransaction and written with a single PUT, whichever
+worker process they arrive in. Each change is appended to a per-config queue
+file under TMP_FILE_ROOT. The caller that wins a non-blocking flock on the
+leader lock waits for the window to close, commits every queued change and
+publishes each caller's outcome in a results file. The PUT response of a batch
+is written once to its own file, so the shared results file only holds small
+per-change records. The other callers poll for their outcome. If the leader lock is released while their change is
+still queued (e.g. the leader crashed), the next caller to poll takes over.
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+from contextlib import contextmanager
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME, IOC_QUEUE_FILE, IOC_RESULTS_FILE, IOC_QUEUE_POLL, IOC_RESULT_TTL
+from .utils import state_id, PSMRequestError
+from .policy import PolicyTransaction
+from .state_store import StateStore
+from .deadline import remaining, DeadlineExceeded
+from .metrics import inc
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def error_outcome(ex):
+    """The published outcome of a change that failed with ex"""
+    return {'error': str(ex), 'status_code': getattr(ex, 'status_code', None), 'at': time.time()}
+
+
+def raise_outcome_error(outcome):
+    """Raise the error of a published outcome in the caller's process"""
+    if outcome.get('status_code') is not None:
+        raise PSMRequestError(outcome['error'], outcome['status_code'])
+    raise ConnectorError(outcome['error'])
+
+
+class IOCCommitQueue():
+    """Coalesces IOC changes per config into one policy write per window, across worker processes"""
+
+    def __init__(self, config):
+        self.config = config
+        self.state_id = state_id(config)
+        self.queue = StateStore(self.state_id, IOC_QUEUE_FILE)
+        self.results = StateStore(self.state_id, IOC_RESULTS_FILE)
+        self.leader_filename = f'{self.queue.state_filename}.leader'
+
+    @contextmanager
+    def leadership(self):
+        """Yields True if this caller holds the leader lock, False if another caller does"""
+        with open(self.leader_filename, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def pending(self):
+        """Returns the queued changes"""
+        with self.queue.lock():
+            return (self.queue.load() or {}).get('pending', [])
+
+    def enqueue(self, entry):
+        """Append a change to the queue file"""
+        with self.queue.lock():
+            state = self.queue.load() or {'pending': []}
+            state['pending'].append(entry)
+            self.queue.save(state)
+
+    def dequeue(self, change_ids):
+        """Remove changes from the queue file. Returns the ids that were still queued."""
+        with self.queue.lock():
+            state = self.queue.load() or {'pending': []}
+            removed = {entry['id'] for entry in state['pending'] if entry['id'] in change_ids}
+            state['pending'] = [entry for entry in state['pending'] if entry['id'] not in removed]
+            self.queue.save(state)
+        return removed
+
+    def batch_store(self, batch_id):
+        """The file holding the PUT response of one committed batch"""
+        return StateStore(f'{self.state_id}_{batch_id}', IOC_RESULTS_FILE)
+
+    def remove_batch(self, batch_id):
+        """Delete the PUT response of a batch nobody is waiting for any more"""
+        try:
+            self.batch_store(batch_id).remove()
+        except FileNotFoundError:
+            pass
+
+    def take_result(self, change_id):
+        """Pop and return the published outcome of a change, or None if it is not committed yet"""
+        batch_file = None
+        with self.results.lock():
+            state = self.results.load() or {'changes': {}}
+            outcome = state['changes'].pop(change_id, None)
+            if outcome is None:
+                return None
+
+            if 'batch' in outcome:
+                # opened under the lock, so this caller can still read it once the file is removed
+                batch_file = open(self.batch_store(outcome['batch']).state_filename, 'r')
+                if not any(other.get('batch') == outcome['batch'] for other in state['changes'].values()):
+                    self.remove_batch(outcome['batch'])
+            self.results.save(state)
+
+        if batch_file:
+            with batch_file:
+                outcome['result'] = json.load(batch_file)
+        return outcome
+
+    def publish(self, result, applied, outcomes):
+        """Record the outcomes of the applied changes and the errors of the others.
+           The PUT response is saved once for the whole batch. Outcomes nobody collected
+           within IOC_RESULT_TTL seconds are dropped.
+        """
+        now = time.time()
+        if applied:
+            batch_id = uuid.uuid4().hex
+            self.batch_store(batch_id).save(result)
+
+        with self.results.lock():
+            state = self.results.load() or {'changes': {}}
+            expired = {
+                change_id: outcome for change_id, outcome in state['changes'].items()
+                if now - outcome['at'] >= IOC_RESULT_TTL
+            }
+            for change_id in expired:
+                del state['changes'][change_id]
+            referenced = {outcome.get('batch') for outcome in state['changes'].values()}
+            for stale in {outcome.get('batch') for outcome in expired.values()} - referenced - {None}:
+                self.remove_batch(stale)
+
+            for entry in applied:
+                state['changes'][entry['id']] = {'batch': batch_id, 'at': now}
+            state['changes'].update(outcomes)
+            self.results.save(state)
+
+    def submit(self, change, ioc_ip, window):
+        """Queue an 'ioc_add' or 'ioc_remove' change and wait for its batch to commit.
+           Returns the PUT response of the batch or raises the change's error.
+        """
+        change_id = uuid.uuid4().hex
+        self.enqueue({'id': change_id, 'change': change, 'ioc_ip': ioc_ip})
+
+        # only re-read the results file when another caller has written it
+        results_version = None
+        while True:
+            try:
+                stat = os.stat(self.results.state_filename)
+                version = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                version = None
+            if version != results_version:
+                results_version = version
+                outcome = self.take_result(change_id)
+                if outcome is not None:
+                    break
+
+            left = remaining()
+            if left is not None and left <= 0:
+                queued = self.dequeue({change_id})
+                message = 'Operation deadline exceeded waiting for the IOC batch commit'
+                logger.exception(message)
+                raise DeadlineExceeded(message if queued else f'{message}. The change may still be applied.')
+
+            with self.leadership() as leader:
+                if leader and any(entry['id'] == change_id for entry in self.pending()):
+                    time.sleep(window if left is None else min(window, max(left, 0)))
+                    self.commit()
+                    continue
+
+            time.sleep(IOC_QUEUE_POLL)
+
+        if 'error' in outcome:
+            raise_outcome_error(outcome)
+        return outcome['result']
+
+    def commit(self):
+        """Apply every queued change to one transaction, write it once and publish the outcomes.
+           Callers must hold the leader lock.
+        """
+        batch = self.pending()
+        if not batch:
+            return
+
+        logger.info(f'Committing {len(batch)} coalesced IOC changes')
+        result = None
+        applied = []
+        outcomes = {}
+        try:
+            transaction = PolicyTransaction(self.config, {})
+            for entry in batch:
+                try:
+                    getattr(transaction, entry['change'])(entry['ioc_ip'])
+                    applied.append(entry)
+                except Exception as ex:
+                    outcomes[entry['id']] = error_outcome(ex)
+
+            result = transaction.commit()
+            inc('ioc_commits')
+            inc('ioc_coalesced_changes', len(applied))
+
+        except Exception as ex:
+            applied = []
+            for entry in batch:
+                outcomes.setdefault(entry['id'], error_outcome(ex))
+
+        # publish before dequeuing, so a crash in between retries the batch rather than losing it
+        self.publish(result, applied, outcomes)
+        self.dequeue({entry['id'] for entry in batch})
@@ -0,0 +1,117 @@
+"""Ordered IOC address set used to build the IOC Block rules"""
+
+import ipaddress
+
+
+def parse_network(address):
+    """Returns address as an ip_network, or None if it is not an IP address or CIDR"""
+    try:
+        return ipaddress.ip_network(address, strict=False)
+    except ValueError:
+        return None
+
+
+def format_network(network):
+    """Single hosts are written as plain addresses, everything else as a CIDR"""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+class IOCSet():
+    """Insertion ordered set of IOC addresses with O(1) membership, add and remove.
+
+       Entries keep the position of their first insertion so the oldest IOCs
+       are evicted first. collapse() merges adjacent and contained addresses
+       into CIDRs so more IOCs fit into the rule before anything is evicted.
+       Entries that are not IP addresses (e.g. ranges) are kept verbatim.
+    """
+
+    def __init__(self, addresses=()):
+        # dict preserves insertion order. values are unused.
+        self.entries = dict.fromkeys(addresses)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, address):
+        return address in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def add(self, addresses):
+        """Add addresses, keeping existing entries in place"""
+        for address in addresses:
+            self.entries.setdefault(address)
+
+    def remove(self, addresses):
+        """Remove addresses. An address inside a stored CIDR splits that CIDR.
+           Returns the addresses that were not found.
+        """
+        missing = []
+        for address in addresses:
+            if address in self.entries:
+                del self.entries[address]
+            elif not self._exclude(address):
+                missing.append(address)
+        return missing
+
+    def _exclude(self, address):
+        """Carve address out of the stored network that contains it, keeping its position"""
+        network = parse_network(address)
+        if network is None:
+            return False
+
+        for entry in self.entries:
+            entry_network = parse_network(entry)
+            if (
+                entry_network is not None
+                and entry_network.version == network.version
+                and entry_network != network
+                and network.subnet_of(entry_network)
+            ):
+                remainder = [format_network(n) for n in sorted(entry_network.address_exclude(network))]
+                self._replace(entry, remainder)
+                return True
+
+        return False
+
+    def _replace(self, entry, new_entries):
+        items = list(self.entries)
+        index = items.index(entry)
+        items[index:index + 1] = new_entries
+        self.entries = dict.fromkeys(items)
+
+    def collapse(self):
+        """Returns the entries with adjacent and contained addresses merged into CIDRs.
+           Each merged CIDR takes the position of its newest member.
+        """
+        positions = []
+        networks = {4: [], 6: []}
+        for position, entry in enumerate(self.entries):
+            network = parse_network(entry)
+            if network is None:
+                positions.append((position, entry))
+            else:
+                networks[network.version].append((network, position))
+
+        for members in networks.values():
+            if not members:
+                continue
+
+            members.sort(key=lambda member: (member[0].network_address, member[0].prefixlen))
+            collapsed = iter(ipaddress.collapse_addresses(member[0] for member in members))
+            current = next(collapsed)
+            newest = -1
+            for network, position in members:
+                # members are sorted, so a member past the current CIDR belongs to the next one
+                if network.network_address > current.broadcast_address:
+                    positions.append((newest, format_network(current)))
+                    current = next(collapsed)
+                    newest = -1
+                newest = max(newest, position)
+            positions.append((newest, format_network(current)))
+
+        positions.sort()
+        return [entry for _, entry in positions]
@@ -0,0 +1,125 @@
+"""Incremental decoder for PSM list responses"""
+
+import json
+import codecs
+
+
+WHITESPACE = ' \t\n\r'
+NUMBER_CHARS = '0123456789+-.eE'
+# drop consumed text from the buffer once this many characters have been read
+BUFFER_TRIM = 1 << 16
+
+
+class JSONListStream():
+    """Decodes a PSM list response ({"kind": ..., "list-meta": ..., "items": [...]})
+       from an iterable of byte chunks, yielding the items one at a time.
+
+       Only the current item is held decoded, so memory stays bounded by the
+       largest item instead of the whole body. The other top level members are
+       collected in envelope as they are passed; members after "items" are
+       available once iteration is complete.
+    """
+
+    def __init__(self, chunks, items_key='items'):
+        self.chunks = iter(chunks)
+        self.items_key = items_key
+        self.envelope = {}
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Append the next chunk to the buffer. Returns False at the end of the stream."""
+        if self.eof:
+            return False
+
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.buffer += self.text_decoder.decode(b'', final=True)
+            return False
+
+        if self.pos > BUFFER_TRIM:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        self.buffer += self.text_decoder.decode(chunk)
+        return True
+
+    def _peek(self):
+        """Skip whitespace and return the next character, or '' at the end of the stream"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        """Consume the next character, which must be one of chars"""
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f'Expected one of {chars!r} but found {char or "end of data"!r}')
+        self.pos += 1
+        return char
+
+    def _value(self):
+        """Decode the next complete JSON value, reading chunks until it is complete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._read_ahead():
+                    raise
+                continue
+
+            # a number at the end of the buffer may continue in the next chunk
+            if (
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                and not self.buffer[end:].strip(NUMBER_CHARS) and self._fill()
+            ):
+                continue
+
+            self.pos = end
+            return value
+
+    def _read_ahead(self):
+        """Grow the buffer by at least the size of the partial value already buffered,
+           so a value spanning many chunks is re-parsed a logarithmic number of times
+        """
+        target = len(self.buffer) + max(len(self.buffer) - self.pos, 1)
+        grown = False
+        while len(self.buffer) < target and self._fill():
+            grown = True
+        return grown
+
+    def __iter__(self):
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError('Expected an object key')
+            self._expect(':')
+
+            if key == self.items_key and self._peek() == '[':
+                self.pos += 1
+                if self._peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.envelope[key] = self._value()
+
+            if self._expect(',}') == '}':
+                return
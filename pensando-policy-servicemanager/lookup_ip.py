@@ -0,0 +1,22 @@
+"""lookup_ip operation"""
+
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+from .enrichment import lookup_address
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def lookup_ip(config, params):
+    """Returns the workload, host and DSC that own an IP or MAC address, answered
+       from the cached enrichment index along with its age and hit/miss metrics
+    """
+    address = (params.get('ip') or '').strip()
+    refresh = params.get('refresh', False)
+
+    if not address:
+        logger.exception('IP field is required but blank.')
+        raise ConnectorError('IP field is required but blank.')
+
+    return lookup_address(config, address, refresh)
@@ -0,0 +1,194 @@
+"""Per operation timing spans, counters and gauges
+
+The one place the connector counts things: requests and bytes, retries,
+logins, cache and enrichment index hits, policy write conflicts and so on.
+Reports such as ResponseCache.report read their totals back from here.
+
+Recording is a perf_counter read and a dict update under a lock, cheap enough
+to leave on. Values accumulate for the life of the worker process and can be
+exported as a JSON snapshot or in the Prometheus text format, optionally as a
+textfile for the node_exporter textfile collector.
+"""
+
+import os
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from connectors.core.connector import get_logger
+from .constants import LOGGER_NAME, METRICS_PREFIX, METRICS_EXPORT_INTERVAL
+
+
+logger = get_logger(LOGGER_NAME)
+
+_lock = threading.Lock()
+# (operation, span) -> [count, total seconds, max seconds]
+_spans = {}
+# (operation, counter) -> value
+_counters = {}
+# gauge -> last value
+_gauges = {}
+_last_export = {'at': 0.0}
+# name of the running operation. a context variable so work done on AsyncPSMClient
+# worker threads is attributed to the operation that started it.
+_operation = ContextVar('metrics_operation', default=None)
+
+
+@contextmanager
+def operation_context(operation):
+    """Attribute the metrics recorded in this context to operation"""
+    token = _operation.set(operation)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def current_operation():
+    """Name of the running operation, or 'connector' outside an operation"""
+    return _operation.get() or 'connector'
+
+
+@contextmanager
+def span(name):
+    """Time the block as span name of the current operation"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def observe(name, seconds):
+    """Record one timing of span name"""
+    key = (current_operation(), name)
+    with _lock:
+        entry = _spans.get(key)
+        if entry is None:
+            _spans[key] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+
+def inc(name, value=1):
+    """Add value to counter name of the current operation"""
+    key = (current_operation(), name)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def inc_many(values):
+    """Add {counter: value} to the counters of the current operation under one lock"""
+    operation = current_operation()
+    with _lock:
+        for name, value in values.items():
+            key = (operation, name)
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def totals(prefix=''):
+    """Returns {counter: value} summed over all operations for the counters starting
+       with prefix, with the prefix removed
+    """
+    result = {}
+    with _lock:
+        for (_, name), value in _counters.items():
+            if name.startswith(prefix):
+                result[name[len(prefix):]] = result.get(name[len(prefix):], 0) + value
+    return result
+
+
+def set_gauge(name, value):
+    """Set gauge name to its latest value"""
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot():
+    """Returns all metrics as a JSON serializable dict"""
+    result = {'pid': os.getpid(), 'spans': {}, 'counters': {}, 'gauges': {}}
+    with _lock:
+        for (operation, name), (count, seconds, max_seconds) in _spans.items():
+            result['spans'].setdefault(operation, {})[name] = {
+                'count': count, 'seconds': round(seconds, 6), 'max_seconds': round(max_seconds, 6)
+            }
+        for (operation, name), value in _counters.items():
+            result['counters'].setdefault(operation, {})[name] = value
+        result['gauges'] = dict(_gauges)
+    return result
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+def export_prometheus():
+    """Returns the metrics in the Prometheus text exposition format"""
+    data = snapshot()
+    pid = data['pid']
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f'# HELP {METRICS_PREFIX}_{name} {help_text}')
+        lines.append(f'# TYPE {METRICS_PREFIX}_{name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{METRICS_PREFIX}_{name}{_labels(pid=pid, **labels)} {value}')
+
+    spans = [(operation, name, values) for operation, names in data['spans'].items() for name, values in names.items()]
+    family('span_seconds_total', 'counter', 'Time spent in each span',
+           [({'operation': o, 'span': n}, v['seconds']) for o, n, v in spans])
+    family('span_count_total', 'counter', 'Number of times each span ran',
+           [({'operation': o, 'span': n}, v['count']) for o, n, v in spans])
+    family('span_max_seconds', 'gauge', 'Longest single run of each span',
+           [({'operation': o, 'span': n}, v['max_seconds']) for o, n, v in spans])
+    family('events_total', 'counter', 'Event counters (requests, bytes, retries, logins, cache hits, ...)',
+           [({'operation': o, 'event': n}, v) for o, names in data['counters'].items() for n, v in names.items()])
+    family('gauge', 'gauge', 'Latest observed sizes (policy rule count, IOC list length, ...)',
+           [({'gauge': n}, v) for n, v in data['gauges'].items()])
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(directory):
+    """Atomically write this process's metrics to <directory>/<prefix>_<pid>.prom"""
+    filename = os.path.join(directory, f'{METRICS_PREFIX}_{os.getpid()}.prom')
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix=f'.{METRICS_PREFIX}_')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(export_prometheus())
+        os.chmod(tmp_filename, 0o644)
+        os.replace(tmp_filename, filename)
+    except Exception:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+
+def export_metrics(config):
+    """Write the Prometheus textfile if metrics_textfile_dir is set, at most once per
+       METRICS_EXPORT_INTERVAL seconds. Export errors are logged, never raised.
+    """
+    directory = config.get('metrics_textfile_dir') if config else None
+    if not directory:
+        return
+
+    now = time.monotonic()
+    with _lock:
+        if now - _last_export['at'] < METRICS_EXPORT_INTERVAL:
+            return
+        _last_export['at'] = now
+
+    try:
+        write_textfile(directory)
+    except Exception as ex:
+        logger.warning(f'Error writing metrics textfile to {directory}: {ex}')
@@ -0,0 +1,87 @@
+"""Size-aware logging of NetworkSecurityPolicy payloads
+
+Policies can hold thousands of rules, so the payload is never formatted unless
+the log level is enabled. At INFO it is described by its rule count, the change
+in rule count, a digest and the transaction's recorded changes, capped at
+LOG_PAYLOAD_MAX_CHARS. Payloads of up to LOG_PAYLOAD_INLINE_RULES rules are
+also shown inline. With log_full_payloads enabled the whole payload is logged
+at DEBUG level instead.
+"""
+
+import json
+import marshal
+import logging
+import hashlib
+from connectors.core.connector import get_logger
+from .constants import LOGGER_NAME, LOG_PAYLOAD_MAX_CHARS, LOG_PAYLOAD_INLINE_RULES
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def truncate(text, max_chars=LOG_PAYLOAD_MAX_CHARS):
+    """Cap text at max_chars, noting how much was cut"""
+    if len(text) <= max_chars:
+        return text
+    return f'{text[:max_chars]}... ({len(text) - max_chars} more chars)'
+
+
+def rules_digest(rules):
+    """Short digest of a rule list to correlate log lines. marshal is several times
+       faster than JSON encoding, and its output only depends on the rules and their
+       key order for a given Python version.
+    """
+    return hashlib.blake2b(marshal.dumps(rules), digest_size=6).hexdigest()
+
+
+def describe_change(change, args):
+    """'isolate(10.0.0.1)' for a recorded change, with long address lists counted"""
+    described = []
+    for arg in args:
+        if isinstance(arg, (list, tuple, set, dict)) and len(arg) > 3:
+            described.append(f'[{len(arg)} addresses]')
+        elif isinstance(arg, (list, tuple, set, dict)):
+            described.append(', '.join(map(str, arg)))
+        else:
+            described.append(str(arg))
+    return f'{change.lstrip("_")}({"; ".join(described)})'
+
+
+class RulesSummary():
+    """Formats a rule list summary when, and only if, a handler emits the record"""
+
+    def __init__(self, rules, base_count=None, changes=None):
+        self.rules = rules
+        self.base_count = base_count
+        self.changes = changes
+
+    def __str__(self):
+        parts = [f'{len(self.rules)} rules']
+        if self.base_count is not None:
+            parts.append(f'{len(self.rules) - self.base_count:+d} vs loaded')
+        parts.append(f'digest {rules_digest(self.rules)}')
+        if self.changes:
+            parts.append('changes: ' + ', '.join(describe_change(change, args) for change, args in self.changes))
+        if len(self.rules) <= LOG_PAYLOAD_INLINE_RULES:
+            parts.append(f'rules: {self.rules}')
+        return truncate(', '.join(parts))
+
+
+class FullPayload():
+    """Formats the whole payload as JSON when the record is emitted"""
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return json.dumps(self.payload)
+
+
+def log_policy_payload(config, message, payload, rules, base_count=None, changes=None):
+    """Log a policy payload: in full at DEBUG if log_full_payloads is enabled,
+       otherwise as a capped summary at INFO. Does nothing if the level is off.
+    """
+    if config.get('log_full_payloads') and logger.isEnabledFor(logging.DEBUG):
+        logger.debug('%s: %s', message, FullPayload(payload))
+    elif logger.isEnabledFor(logging.INFO):
+        logger.info('%s: %s', message, RulesSummary(rules, base_count, changes))
@@ -0,0 +1,479 @@
+"""NetworkSecurityPolicy rule helpers and the policy transaction shared by the
+isolation and IOC operations"""
+
+import time
+import random
+import threading
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import (
+    LOGGER_NAME, SENTINEL_IP, IOC_LIST_MAX, IOC_SHARDS, IOC_SHARDS_MAX, IOC_SHARD_SENTINEL_PREFIX,
+    POLICY_NAME_TTL, POLICY_WRITE_RETRIES, POLICY_WRITE_BACKOFF, POLICY_CONFLICT_STATUS_CODES
+)
+from .utils import invoke_rest_endpoint, config_fingerprint, PSMRequestError
+from .get_network_security_policies import get_network_security_policies
+from .ioc_set import IOCSet
+from .rule_index import RuleIndex
+from .metrics import span, inc, set_gauge
+from .payload_log import log_policy_payload
+
+
+logger = get_logger(LOGGER_NAME)
+
+# resolved NetworkSecurityPolicy names keyed by (config fingerprint, tenant) -> (name, resolved_at)
+_policy_name_cache = {}
+_policy_name_cache_lock = threading.Lock()
+
+
+def deny_rule(from_ip_addresses, to_ip_addresses):
+    """Returns a rule that denies all traffic between the two address lists"""
+    return {
+        "proto-ports": [
+            {
+                "protocol": "any",
+                "ports": ""
+            }
+        ],
+        "action": "deny",
+        "from-ip-addresses": from_ip_addresses,
+        "to-ip-addresses": to_ip_addresses
+    }
+
+
+def build_policy_body(rules, policy_name=None, resource_version=None):
+    """Returns the NetworkSecurityPolicy body used for PUT requests.
+       Includes the resource-version the rules were read at so PSM rejects stale writes.
+    """
+    body = {
+        'kind': 'NetworkSecurityPolicy',
+        'api-version': 'v1',
+        'spec': {
+            'attach-tenant': True,
+            'rules': rules
+        }
+    }
+
+    if resource_version:
+        body['meta'] = {
+            'name': policy_name,
+            'resource-version': resource_version
+        }
+
+    return body
+
+
+def add_isolation_rules(rules, host_source_ip):
+    """Insert the outbound and inbound isolation rules for a host at the top of rules"""
+    rules.insert(0, deny_rule(['0.0.0.0/0'], [host_source_ip]))
+    rules.insert(0, deny_rule([host_source_ip], ['0.0.0.0/0']))
+
+
+def remove_isolation_rules(rules, host_source_ip, index=None):
+    """Remove the contiguous isolation rule pair for a host from rules.
+       Raises ConnectorError if the pair is missing or not contiguous.
+    """
+    if index is None:
+        index = RuleIndex(rules)
+
+    # remove the matched rules with a simple method. only works on contiguous rules.
+    first, _ = index.isolation_pair(host_source_ip)
+    del rules[first]
+    del rules[first]
+
+
+def ioc_sentinel(shard):
+    """Returns the RFC 5737 sentinel address that tags IOC Block rule pair number shard.
+       Shard 0 uses SENTINEL_IP so existing single pair blocklists are shard 0.
+    """
+    if shard == 0:
+        return SENTINEL_IP
+    return f'{IOC_SHARD_SENTINEL_PREFIX}{shard}'
+
+
+IOC_SENTINELS = {ioc_sentinel(shard): shard for shard in range(IOC_SHARDS_MAX)}
+
+
+def find_ioc_rules(rules, action='update', index=None):
+    """Returns {shard: [indexes of its IOC Block rule pair]} for every sentinel tagged pair"""
+    if index is None:
+        index = RuleIndex(rules, IOC_SENTINELS)
+
+    matches = {IOC_SENTINELS[sentinel]: positions for sentinel, positions in index.sentinels.items()}
+
+    logger.info(f'rule matches: {matches}')
+
+    for match_list in matches.values():
+        # check length of match_list to see if there two or more matches. if not fail gracefully.
+        if len(match_list) == 1:
+            logger.exception('Expected two rules, but found one. Rule update aborted.')
+            raise ConnectorError('Expected two rules, but found one. Rule update aborted.')
+
+        # ensure rules are contiguous
+        if match_list[1] != match_list[0] + 1:
+            logger.exception(f'Rules are not contiguous. Rule {action} aborted.')
+            raise ConnectorError(f'Rules are not contiguous. Rule {action} aborted.')
+
+    return matches
+
+
+def get_ioc_list(rules, match_list, sentinel):
+    """Returns the IOC addresses held by an IOC Block rule pair, without its sentinel"""
+    if sentinel in rules[match_list[0]]['to-ip-addresses']:
+        ioc_list = rules[match_list[0]]['to-ip-addresses']
+    else:
+        ioc_list = rules[match_list[0]]['from-ip-addresses']
+
+    return [ip for ip in ioc_list if ip != sentinel]
+
+
+class IOCBlocklist():
+    """The IOC blocklist of a policy, split across sentinel tagged rule pairs (shards).
+
+       Each shard holds up to IOC_LIST_MAX - 1 entries next to its sentinel. New
+       IOCs go to the shard with the fewest entries. Existing shards are kept
+       even if shard_count is lowered so no IOC is dropped.
+    """
+
+    def __init__(self, rules, shard_count=1, action='update', index=None):
+        self.rules = rules
+        self.matches = find_ioc_rules(rules, action, index)
+        shard_count = max(shard_count, max(self.matches, default=-1) + 1)
+        self.shards = [
+            IOCSet(get_ioc_list(rules, self.matches[shard], ioc_sentinel(shard)) if shard in self.matches else [])
+            for shard in range(shard_count)
+        ]
+        # address -> shard, for O(1) duplicate checks and removals across shards
+        self.locations = {}
+        for shard, ioc_set in enumerate(self.shards):
+            self.locations.update(dict.fromkeys(ioc_set, shard))
+
+    def exists(self):
+        """True if the policy already has IOC Block rules"""
+        return bool(self.matches)
+
+    def add(self, addresses):
+        """Add addresses not already blocked, balancing them across shards"""
+        for address in addresses:
+            if address in self.locations:
+                continue
+
+            shard = min(range(len(self.shards)), key=lambda index: len(self.shards[index]))
+            self.shards[shard].add([address])
+            self.locations[address] = shard
+
+    def remove(self, addresses):
+        """Remove addresses from their shards. Returns the addresses that were not found."""
+        missing = []
+        for address in addresses:
+            shard = self.locations.pop(address, None)
+            if shard is not None:
+                self.shards[shard].remove([address])
+                continue
+
+            # not stored as-is - it may be inside a collapsed CIDR
+            for shard, ioc_set in enumerate(self.shards):
+                if not ioc_set.remove([address]):
+                    self.locations.update(dict.fromkeys(ioc_set, shard))
+                    break
+            else:
+                missing.append(address)
+
+        return missing
+
+    def delete(self):
+        """Remove every IOC Block rule pair from the rules"""
+        # delete from the bottom up so earlier indexes stay valid
+        for match_list in sorted(self.matches.values(), reverse=True):
+            del self.rules[match_list[0]]
+            del self.rules[match_list[0]]
+        self.matches = {}
+
+    def write(self):
+        """Replace the IOC Block rule pairs with the current shards at the top of the rules"""
+        self.delete()
+
+        ioc_count = 0
+        for shard in reversed(range(len(self.shards))):
+            # shard 0 is always written, like the single pair blocklist. other shards only when used.
+            if shard and not self.shards[shard]:
+                continue
+
+            # collapse into CIDRs and keep the newest entries that fit next to the sentinel. FIFO old ones.
+            ioc_list = self.shards[shard].collapse()
+            evicted = len(ioc_list) - (IOC_LIST_MAX - 1)
+            if evicted > 0:
+                logger.warning(f'IOC list shard {shard} full. Evicted {evicted} oldest entries.')
+                ioc_list = ioc_list[evicted:]
+            ioc_count += len(ioc_list)
+            ioc_list.append(ioc_sentinel(shard))
+
+            # add two IOC Block rules to the top of the NetworkSecurityPolicy
+            self.rules.insert(0, deny_rule(['0.0.0.0/0'], ioc_list))
+            self.rules.insert(0, deny_rule(ioc_list, ['0.0.0.0/0']))
+
+        set_gauge('ioc_list_length', ioc_count)
+
+
+def resolve_policy_name(config, refresh=False):
+    """Returns the name of the tenant's NetworkSecurityPolicy.
+       Uses the policy name pinned in config if set, otherwise lists the policies
+       and caches the first one's name per config and tenant for policy_name_ttl seconds.
+       Returns (policy_name, listed) where listed is True if a listing request was made.
+    """
+    pinned_name = config.get('policy_name')
+    if pinned_name:
+        return pinned_name, False
+
+    key = (config_fingerprint(config), config.get('tenant'))
+    ttl = config.get('policy_name_ttl')
+    ttl = int(ttl if ttl not in (None, '') else POLICY_NAME_TTL)
+
+    with _policy_name_cache_lock:
+        cached = _policy_name_cache.get(key)
+
+    if cached and not refresh and time.monotonic() - cached[1] < ttl:
+        return cached[0], False
+
+    # query Pensando SVC Mgr to get the NetworkSecurityPolicy name. only the tenant's
+    # first policy is needed, so don't list every policy of every tenant.
+    policy_name_result = get_network_security_policies(config, {'tenant': config.get('tenant'), 'limit': 1})
+    if not (policy_name_result or {}).get('items'):
+        logger.exception(f'No NetworkSecurityPolicy found for tenant {config.get("tenant")}')
+        raise ConnectorError(f'No NetworkSecurityPolicy found for tenant {config.get("tenant")}')
+    policy_name = policy_name_result['items'][0]['meta']['name']
+    logger.info(f'policy name: {policy_name}')
+
+    with _policy_name_cache_lock:
+        _policy_name_cache[key] = (policy_name, time.monotonic())
+
+    return policy_name, True
+
+
+def invalidate_policy_name(config):
+    """Drop the cached policy name for config"""
+    with _policy_name_cache_lock:
+        _policy_name_cache.pop((config_fingerprint(config), config.get('tenant')), None)
+
+
+class PolicyTransaction():
+    """Loads the tenant's NetworkSecurityPolicy once, applies isolation and IOC
+       changes to its rules in memory and writes it back with a single PUT.
+
+       Writes carry the resource-version the policy was read at. If another
+       writer got there first, the policy is fetched again, the recorded changes
+       are replayed on top of it and the write is retried with backoff.
+
+       round_trips counts the HTTP requests made by the transaction, conflicts
+       and retries count rejected writes and write attempts after the first.
+    """
+
+    def __init__(self, config, params):
+        self.config = config
+        self.round_trips = 0
+        self.conflicts = 0
+        self.retries = 0
+        self.changes = []
+        self.changed = False
+        self.ioc_shards = min(int(config.get('ioc_shards') or IOC_SHARDS), IOC_SHARDS_MAX)
+        self._index = None
+        self.load()
+
+    def load(self, refresh=False):
+        """Resolve the policy name and pull the network security policy"""
+        tenant = self.config.get('tenant')
+        self.policy_name, listed = resolve_policy_name(self.config, refresh)
+        self.round_trips += int(listed)
+        self.endpoint = f'/configs/security/v1/tenant/{tenant}/networksecuritypolicies/{self.policy_name}'
+
+        try:
+            security_policy = self.request('GET')
+        except PSMRequestError as ex:
+            # the cached or pinned policy name is stale - resolve it again once
+            if ex.status_code != 404 or listed or self.config.get('policy_name'):
+                raise
+            logger.warning(f'NetworkSecurityPolicy {self.policy_name} not found. Resolving policy name again.')
+            invalidate_policy_name(self.config)
+            return self.load(refresh=True)
+
+        self.resource_version = security_policy.get('meta', {}).get('resource-version')
+        self.rules = security_policy['spec']['rules']
+        self.loaded_rule_count = len(self.rules)
+        self._index = None
+        set_gauge('policy_rules', len(self.rules))
+        log_policy_payload(self.config, f'Loaded NetworkSecurityPolicy {self.policy_name}', security_policy, self.rules)
+
+    def request(self, method, data=None):
+        """Send a request for the policy and count the round trip"""
+        self.round_trips += 1
+        return invoke_rest_endpoint(self.config, self.endpoint, method, data)
+
+    def index(self):
+        """Returns the RuleIndex of the current rules, building it on first use"""
+        if self._index is None:
+            self._index = RuleIndex(self.rules, IOC_SENTINELS)
+        return self._index
+
+    def run_change(self, change, *args):
+        """Run a change on the rules and drop the RuleIndex, whose positions it may have moved"""
+        try:
+            with span('rule_update'):
+                return getattr(self, change)(*args)
+        finally:
+            self._index = None
+
+    def apply(self, change, *args):
+        """Apply a change to the rules and record it so it can be replayed after a write conflict"""
+        result = self.run_change(change, *args)
+        self.changes.append((change, args))
+        self.changed = True
+        return result
+
+    def isolate(self, host_source_ip):
+        """Add isolation rules for a host, replacing existing ones. Returns True if they were replaced."""
+        return self.apply('_isolate', host_source_ip)
+
+    def unisolate(self, host_source_ip):
+        """Remove the isolation rules for a host. Raises ConnectorError if there are none."""
+        return self.apply('_unisolate', host_source_ip)
+
+    def isolate_many(self, host_source_ips):
+        """Add isolation rules for several hosts in one pass over the rules.
+           Returns {host: True if existing rules were replaced}.
+        """
+        return self.apply('_isolate_many', host_source_ips)
+
+    def unisolate_many(self, host_source_ips):
+        """Remove the isolation rules of several hosts in one pass over the rules.
+           Returns {host: None, or the ConnectorError if the host had no isolation rules}.
+        """
+        return self.apply('_unisolate_many', host_source_ips)
+
+    def ioc_add(self, ioc_ip):
+        """Add IOC addresses to the IOC Block rules, creating them if needed"""
+        return self.apply('_ioc_add', ioc_ip)
+
+    def ioc_remove(self, ioc_ip):
+        """Remove IOC addresses from the IOC Block rules"""
+        return self.apply('_ioc_remove', ioc_ip)
+
+    def ioc_delete(self):
+        """Delete the IOC Block rules"""
+        return self.apply('_ioc_delete')
+
+    def _isolate(self, host_source_ip):
+        # remove rules if they already exist. keeps from duplicating rules.
+        try:
+            remove_isolation_rules(self.rules, host_source_ip, self.index())
+            logger.info(f'matching isolation rules for {host_source_ip} found and removed.')
+            replaced = True
+        except ConnectorError:
+            logger.info('no isolation rules removed.')
+            replaced = False
+
+        add_isolation_rules(self.rules, host_source_ip)
+        return replaced
+
+    def _unisolate(self, host_source_ip):
+        remove_isolation_rules(self.rules, host_source_ip, self.index())
+
+    def _remove_isolation_pairs(self, host_source_ips):
+        """Drop the isolation pairs of the hosts in one pass. Returns {host: None or ConnectorError}."""
+        index = self.index()
+        results = {}
+        removed = set()
+        for host_source_ip in host_source_ips:
+            try:
+                removed.update(index.isolation_pair(host_source_ip))
+                results[host_source_ip] = None
+            except ConnectorError as ex:
+                results[host_source_ip] = ex
+
+        if removed:
+            self.rules[:] = [rule for position, rule in enumerate(self.rules) if position not in removed]
+        return results
+
+    def _isolate_many(self, host_source_ips):
+        removed = self._remove_isolation_pairs(host_source_ips)
+
+        # same order as isolating the hosts one at a time - the last host ends up on top
+        isolation_rules = []
+        for host_source_ip in reversed(host_source_ips):
+            isolation_rules.append(deny_rule([host_source_ip], ['0.0.0.0/0']))
+            isolation_rules.append(deny_rule(['0.0.0.0/0'], [host_source_ip]))
+        self.rules[:0] = isolation_rules
+
+        return {host_source_ip: error is None for host_source_ip, error in removed.items()}
+
+    def _unisolate_many(self, host_source_ips):
+        return self._remove_isolation_pairs(host_source_ips)
+
+    def _ioc_add(self, ioc_ip):
+        blocklist = IOCBlocklist(self.rules, self.ioc_shards, index=self.index())
+        blocklist.add(ioc_ip)
+        blocklist.write()
+
+    def _ioc_remove(self, ioc_ip):
+        blocklist = IOCBlocklist(self.rules, self.ioc_shards, index=self.index())
+        if not blocklist.exists():
+            logger.exception('No matching IOC Block rules. Rule update aborted.')
+            raise ConnectorError('No matching IOC Block rules. Rule update aborted.')
+
+        # remove user supplied IP addresses from the list
+        for ip in blocklist.remove(dict.fromkeys(ioc_ip)):
+            logger.warning(f'{ip} not found in IOC list. Skipping.')
+
+        blocklist.write()
+
+    def _ioc_delete(self):
+        blocklist = IOCBlocklist(self.rules, action='deletion', index=self.index())
+        if not blocklist.exists():
+            logger.exception('No matching IOC Block rules. Rule update aborted.')
+            raise ConnectorError('No matching IOC Block rules. Rule update aborted.')
+
+        blocklist.delete()
+
+    def replay(self):
+        """Fetch the current policy and apply the recorded changes to it again"""
+        self.load()
+        for change, args in self.changes:
+            self.run_change(change, *args)
+
+    def commit(self):
+        """Write the policy back if it changed. Returns the PUT response, or None."""
+        if not self.changed:
+            logger.info('NetworkSecurityPolicy unchanged. Skipping update.')
+            return None
+
+        max_retries = self.config.get('policy_write_retries')
+        max_retries = int(max_retries if max_retries not in (None, '') else POLICY_WRITE_RETRIES)
+        attempt = 0
+        while True:
+            new_security_policy = build_policy_body(self.rules, self.policy_name, self.resource_version)
+            log_policy_payload(
+                self.config, f'Updating NetworkSecurityPolicy {self.policy_name}', new_security_policy,
+                self.rules, self.loaded_rule_count, self.changes
+            )
+            try:
+                result = self.request('PUT', new_security_policy)
+                break
+            except PSMRequestError as ex:
+                if ex.status_code not in POLICY_CONFLICT_STATUS_CODES or attempt >= max_retries:
+                    raise
+
+            # another writer updated the policy since we read it
+            self.conflicts += 1
+            inc('policy_write_conflicts')
+            delay = POLICY_WRITE_BACKOFF * (2 ** attempt) * (1 + random.random())
+            logger.warning(
+                f'NetworkSecurityPolicy {self.policy_name} changed since resource-version '
+                f'{self.resource_version}. Retrying in {delay:.2f}s.'
+            )
+            time.sleep(delay)
+            attempt += 1
+            self.retries += 1
+            inc('policy_write_retries')
+            self.replay()
+
+        set_gauge('policy_rules', len(self.rules))
+        self.changes = []
+        self.changed = False
+        return result
@@ -0,0 +1,68 @@
+"""Response projection: keep only the requested fields of PSM objects"""
+
+import re
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+
+
+logger = get_logger(LOGGER_NAME)
+
+SEGMENT_PATTERN = re.compile(r'^([^\[\]]+)(\[\*\])?$')
+
+
+def compile_projection(fields):
+    """Parses a field list such as 'meta.name, spec.interfaces[*].ip-addresses' into a tree
+       of nested dicts, where None keeps the whole value. fields can be a comma separated
+       string or a list. Returns None if no fields are given.
+
+       Lists are projected element by element, so '[*]' is optional.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    paths = [path.strip() for path in fields or [] if path and path.strip()]
+    if not paths:
+        return None
+
+    tree = {}
+    for path in paths:
+        node = tree
+        segments = path.split('.')
+        for position, segment in enumerate(segments):
+            match = SEGMENT_PATTERN.match(segment.strip())
+            if not match:
+                logger.exception(f'Invalid projection field: {path}')
+                raise ConnectorError(f'Invalid projection field: {path}')
+
+            key = match.group(1)
+            if position == len(segments) - 1:
+                node[key] = None
+            elif key in node and node[key] is None:
+                # a shorter path already keeps the whole value
+                break
+            else:
+                node = node.setdefault(key, {})
+
+    return tree
+
+
+def project(value, tree):
+    """Returns value reduced to the fields in tree. Missing fields are left out."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+def project_response(response, tree):
+    """Projects a PSM response. For list responses the fields apply to each item and
+       the envelope (kind, list-meta) is kept.
+    """
+    if tree is None:
+        return response
+    if isinstance(response, dict) and isinstance(response.get('items'), list):
+        response['items'] = [project(item, tree) for item in response['items']]
+        return response
+    return project(response, tree)
@@ -0,0 +1,124 @@
+"""Conditional GET response cache"""
+
+import time
+import threading
+from collections import OrderedDict
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+from .metrics import inc, totals
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+class CacheEntry():
+    """A cached response body and the validators needed to revalidate it"""
+
+    def __init__(self, body, etag=None, last_modified=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = time.monotonic()
+
+    def conditional_headers(self):
+        """Headers that turn a GET into a revalidation request"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def parse_ttls(value):
+    """Parses 'prefix=seconds, prefix=seconds' into [(prefix, seconds)], longest prefix first"""
+    ttls = []
+    for item in (value or '').split(','):
+        prefix, _, seconds = item.partition('=')
+        if not prefix.strip() or not seconds.strip():
+            continue
+        try:
+            ttls.append((prefix.strip(), float(seconds)))
+        except ValueError:
+            logger.exception(f'Invalid response cache TTL: {item}')
+            raise ConnectorError(f'Invalid response cache TTL: {item}')
+    return sorted(ttls, key=lambda ttl: len(ttl[0]), reverse=True)
+
+
+class ResponseCache():
+    """LRU cache of GET response bodies keyed by config, tenant and URL.
+
+       Entries younger than their endpoint's TTL are served without a request.
+       Older ones are revalidated with If-None-Match / If-Modified-Since and a
+       304 serves the cached body. Bodies are kept as bytes, so the size cap is
+       exact and every hit is parsed into objects the caller may modify.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self._ttls = {}
+
+    def ttl(self, ttls, endpoint):
+        """Returns the TTL of the longest configured prefix matching endpoint, or 0"""
+        parsed = self._ttls.get(ttls)
+        if parsed is None:
+            parsed = self._ttls[ttls] = parse_ttls(ttls)
+        for prefix, seconds in parsed:
+            if endpoint.startswith(prefix):
+                return seconds
+        return 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, max_size):
+        """Store entry, evicting least recently used entries to stay within max_size bytes"""
+        if len(entry.body) > max_size:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous:
+                self.size -= len(previous.body)
+            self.entries[key] = entry
+            self.size += len(entry.body)
+
+            while self.size > max_size:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                inc('response_cache_evictions')
+
+    def invalidate(self, scope, endpoint):
+        """Drop the cached responses of scope in endpoint's API group (e.g. /configs/security/v1),
+           which covers the written object and every tenant scoped or global list of it
+        """
+        group = '/'.join(endpoint.split('/')[:4])
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == scope and key[1].startswith(group)]:
+                self.size -= len(self.entries.pop(key).body)
+                inc('response_cache_invalidations')
+
+    def record(self, outcome):
+        """Count a lookup as 'hits', 'revalidated' or 'misses'"""
+        inc(f'response_cache_{outcome}')
+
+    def report(self):
+        """Returns the counters, hit ratio and size of the cache"""
+        stats = dict.fromkeys(('hits', 'revalidated', 'misses', 'evictions', 'invalidations'), 0)
+        stats.update(totals('response_cache_'))
+        with self.lock:
+            lookups = stats['hits'] + stats['revalidated'] + stats['misses']
+            stats['hit_ratio'] = round((stats['hits'] + stats['revalidated']) / lookups, 3) if lookups else None
+            stats['entries'] = len(self.entries)
+            stats['size'] = self.size
+            return stats
+
+
+# process-wide cache shared by all configs
+response_cache = ResponseCache()
@@ -0,0 +1,129 @@
+"""Inverted IP to rule index over a NetworkSecurityPolicy"""
+
+import ipaddress
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME
+
+
+logger = get_logger(LOGGER_NAME)
+
+ANY_ADDRESS = 'any'
+ROLES = (('from', 'from-ip-addresses'), ('to', 'to-ip-addresses'))
+
+
+def is_deny_any(rule):
+    """True if rule denies all protocols and ports"""
+    proto_ports = rule.get('proto-ports') or [{}]
+    return all(
+        (
+            proto_ports[0].get('protocol') == 'any',
+            proto_ports[0].get('ports') == '',
+            rule.get('action') == 'deny'
+        )
+    )
+
+
+class RuleIndex():
+    """Maps addresses to the positions and roles ('from' or 'to') of the rules
+       that reference them. Built once per fetched policy in a single pass, then
+       answers exact, containing-CIDR, isolation pair and sentinel lookups
+       without scanning the rules again.
+
+       Positions refer to the rules as they were when the index was built.
+    """
+
+    def __init__(self, rules, sentinels=()):
+        self.rules = rules
+        # address string -> [(position, role)]
+        self.addresses = {}
+        # version -> prefixlen -> network int -> [(position, role, address)]. built on first CIDR lookup.
+        self.networks = None
+        # host -> [(position, direction)] for deny-any rules between the host and 0.0.0.0/0
+        self.isolation = {}
+        # sentinel -> [positions]
+        self.sentinels = {}
+
+        sentinels = set(sentinels)
+        for position, rule in enumerate(rules):
+            sentinel_found = False
+            for role, key in ROLES:
+                for address in rule.get(key) or []:
+                    self.addresses.setdefault(address, []).append((position, role))
+
+                    if not sentinel_found and address in sentinels:
+                        self.sentinels.setdefault(address, []).append(position)
+                        sentinel_found = True
+
+            self._add_isolation(rule, position)
+
+    def _build_networks(self):
+        """Parse every distinct address once and group them by prefix length"""
+        self.networks = {4: {}, 6: {}}
+        for address, references in self.addresses.items():
+            try:
+                network = ipaddress.ip_network(address, strict=False)
+            except ValueError:
+                continue
+
+            by_prefix = self.networks[network.version].setdefault(network.prefixlen, {})
+            by_prefix.setdefault(int(network.network_address), []).extend(
+                (position, role, address) for position, role in references
+            )
+
+    def _add_isolation(self, rule, position):
+        from_addresses = rule.get('from-ip-addresses') or []
+        to_addresses = rule.get('to-ip-addresses') or []
+        if len(from_addresses) != 1 or len(to_addresses) != 1 or not is_deny_any(rule):
+            return
+
+        if to_addresses == ['0.0.0.0/0']:
+            self.isolation.setdefault(from_addresses[0], []).append((position, 'outbound'))
+        if from_addresses == ['0.0.0.0/0']:
+            self.isolation.setdefault(to_addresses[0], []).append((position, 'inbound'))
+
+    def rules_for_address(self, address):
+        """Returns [(position, role)] of rules that list address verbatim"""
+        return self.addresses.get(address, [])
+
+    def rules_for_ip(self, ip, include_catch_all=True):
+        """Returns the rules that apply to ip: rules that list it, a CIDR containing
+           it or 'any'. Each match is a dict of position, role and matching address.
+           include_catch_all=False leaves out matches through 0.0.0.0/0, ::/0 and 'any'.
+        """
+        if self.networks is None:
+            self._build_networks()
+
+        network = ipaddress.ip_network(ip, strict=False)
+        address = int(network.network_address)
+        matches = []
+
+        # one dict lookup per prefix length in use, never a scan of the rules
+        for prefixlen, by_network in self.networks[network.version].items():
+            if prefixlen > network.prefixlen or (prefixlen == 0 and not include_catch_all):
+                continue
+            mask = ((1 << prefixlen) - 1) << (network.max_prefixlen - prefixlen)
+            for position, role, matched in by_network.get(address & mask, []):
+                matches.append({'index': position, 'role': role, 'address': matched})
+
+        if include_catch_all:
+            for position, role in self.rules_for_address(ANY_ADDRESS):
+                matches.append({'index': position, 'role': role, 'address': ANY_ADDRESS})
+
+        return sorted(matches, key=lambda match: (match['index'], match['role']))
+
+    def isolation_pair(self, host_source_ip):
+        """Returns the positions of the contiguous isolation rule pair for a host.
+           Raises ConnectorError if the pair is missing or not contiguous.
+        """
+        match_list = sorted(position for position, _ in self.isolation.get(host_source_ip, []))
+        logger.info(f'rule matches for {host_source_ip}: {match_list}')
+
+        # check length of match_list to see if there are any matches. if not fail gracefully.
+        if len(match_list) < 2:
+            raise ConnectorError(f'Expected two or more rules, but found {len(match_list)}. Rule deletion aborted.')
+
+        # ensure rules are contiguous
+        if match_list[1] != match_list[0] + 1:
+            raise ConnectorError('Rules are not contiguous. Rule deletion aborted.')
+
+        return match_list[0], match_list[1]
@@ -0,0 +1,99 @@
+"""Pensando session state store
+
+Session state (auth cookies and their expiration) and other per-config state
+such as the alert polling watermark is shared by every worker process through
+a JSON file under TMP_FILE_ROOT. Writers replace the file with
+an atomic rename so readers never see a torn file, and an exclusive flock on a
+sidecar lock file serializes logins across processes.
+"""
+
+import os
+import json
+import fcntl
+import tempfile
+from contextlib import contextmanager
+from requests.cookies import create_cookie
+from connectors.core.connector import get_logger, ConnectorError
+from .constants import LOGGER_NAME, TMP_FILE_ROOT, PSM_STATE_FILE
+
+
+logger = get_logger(LOGGER_NAME)
+
+
+def dump_cookies(cookie_jar):
+    """Serialize a cookie jar to a compact list of dicts"""
+    return [
+        {
+            'name': cookie.name,
+            'value': cookie.value,
+            'domain': cookie.domain,
+            'path': cookie.path,
+            'expires': cookie.expires,
+            'secure': cookie.secure
+        }
+        for cookie in cookie_jar
+    ]
+
+
+def load_cookies(cookie_jar, cookies):
+    """Replace the contents of a cookie jar with serialized cookies"""
+    cookie_jar.clear()
+    for cookie in cookies:
+        cookie_jar.set_cookie(create_cookie(**cookie))
+
+
+class StateStore():
+    """File backed, process safe state for a single connector config.
+       prefix selects the kind of state (session state by default).
+    """
+
+    def __init__(self, state_id, prefix=PSM_STATE_FILE):
+        self.prefix = prefix
+        self.state_filename = os.path.join(TMP_FILE_ROOT, f'{prefix}_{state_id}.json')
+        self.lock_filename = f'{self.state_filename}.lock'
+
+    @contextmanager
+    def lock(self):
+        """Hold an exclusive lock shared by all worker processes using this config"""
+        with open(self.lock_filename, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        """Returns the saved state dict or None if there is no usable state"""
+        try:
+            with open(self.state_filename, 'r') as file:
+                return json.load(file)
+
+        except FileNotFoundError:
+            return None
+
+        except Exception as ex:
+            logger.warning(f'Error loading state from {self.state_filename}: {ex}')
+            return None
+
+    def save(self, state):
+        """Write state to a temp file and atomically rename it over the state file"""
+        fd, tmp_filename = tempfile.mkstemp(dir=TMP_FILE_ROOT, prefix=f'{self.prefix}_')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(state, file, separators=(',', ':'))
+                file.flush()
+                os.fsync(file.fileno())
+            os.chmod(tmp_filename, 0o600)
+            os.replace(tmp_filename, self.state_filename)
+
+        except Exception as ex:
+            logger.exception(f'Error saving state to {self.state_filename}: {ex}')
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+            raise ConnectorError(f'Error saving state: {ex}')
+
+    def remove(self):
+        """Delete the state file"""
+        os.remove(self.state_filename)
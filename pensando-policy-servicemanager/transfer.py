@@ -0,0 +1,69 @@
+"""Request body compression and per operation transfer size accounting"""
+
+import gzip
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from connectors.core.connector import get_logger
+from .constants import LOGGER_NAME
+from .metrics import operation_context, inc_many
+
+
+logger = get_logger(LOGGER_NAME)
+
+COUNTERS = ('requests', 'request_bytes', 'request_bytes_decoded', 'response_bytes', 'response_bytes_decoded')
+
+# counters of the running operation, for its transfer log line. the process-wide totals
+# are kept by metrics. a context variable so requests made from AsyncPSMClient worker
+# threads are counted for the operation that started them.
+_scope = ContextVar('transfer_scope', default=None)
+_scope_lock = threading.Lock()
+
+
+@contextmanager
+def operation_scope(operation):
+    """Attribute the requests and metrics of this context to operation and log its transfer totals"""
+    counters = dict.fromkeys(COUNTERS, 0)
+    token = _scope.set(counters)
+    try:
+        with operation_context(operation):
+            yield
+    finally:
+        _scope.reset(token)
+        if counters['requests']:
+            logger.info(
+                f'{operation} transfer: {counters["requests"]} requests, '
+                f'sent {counters["request_bytes"]} bytes ({counters["request_bytes_decoded"]} decoded), '
+                f'received {counters["response_bytes"]} bytes ({counters["response_bytes_decoded"]} decoded)'
+            )
+
+
+def record_transfer(request_bytes=0, request_bytes_decoded=0, response_bytes=0, response_bytes_decoded=0, requests=1):
+    """Add one request's wire and decoded sizes to the current operation's counters and metrics"""
+    sizes = {
+        'requests': requests,
+        'request_bytes': request_bytes,
+        'request_bytes_decoded': request_bytes_decoded,
+        'response_bytes': response_bytes,
+        'response_bytes_decoded': response_bytes_decoded
+    }
+    inc_many(sizes)
+
+    scope_counters = _scope.get()
+    if scope_counters is not None:
+        with _scope_lock:
+            for name, size in sizes.items():
+                scope_counters[name] += size
+
+
+def response_wire_bytes(response):
+    """Bytes read from the socket for a response body, before content decoding"""
+    try:
+        return response.raw.tell()
+    except Exception:
+        return len(response.content or b'')
+
+
+def compress_body(body):
+    """gzip a request body"""
+    return gzip.compress(body, compresslevel=6)
@@ -1,70 +1,197 @@
 """Pensando Utils """
 
-import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
-import pickle
 import requests
 from requests import Request
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
 from connectors.core.connector import get_logger, ConnectorError
-from .constants import LOGGER_NAME, TMP_FILE_ROOT, PSM_SESSION_FILE, PSM_COOKIE_EXP_FILE
+from .constants import (
+    LOGGER_NAME, SESSION_POOL_SIZE, SESSION_IDLE_TIMEOUT, HTTP_POOL_MAXSIZE, SESSION_REFRESH_WINDOW,
+    LIST_PAGE_SIZE, STREAM_CHUNK_SIZE, ACCEPT_ENCODING, REQUEST_COMPRESS_MIN_SIZE, RESPONSE_CACHE_SIZE,
+    REQUEST_RETRIES, SAFE_METHODS, RETRY_STATUS_CODES, UNPROCESSED_STATUS_CODES
+)
+from .state_store import StateStore, dump_cookies, load_cookies
+from .projection import compile_projection, project, project_response
+from .json_stream import JSONListStream
+from .transfer import record_transfer, response_wire_bytes, compress_body
+from .response_cache import response_cache, CacheEntry
+from .deadline import deadline_scope, request_timeout, backoff
+from .circuit_breaker import get_breaker, CircuitOpenError
+from .metrics import span, observe, inc
 
 
 logger = get_logger(LOGGER_NAME)
 
+# process-wide pool of live PensandoPSM objects keyed by config fingerprint.
+# keeps the requests.Session (and its keep-alive connections) between operations.
+_session_pool = OrderedDict()
+_session_pool_lock = threading.Lock()
+
+
+class PSMRequestError(ConnectorError):
+    """Raised when PSM answers a request with an error status code"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
 
 class PensandoPSM():
     """Keeps session state, including the session cookie and cookie expiration value"""
 
     def __init__(self, config):
-        self.config = config
         self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
         self.cookie_expiration = None
-        config_id = self.config.get('config_id', 'generic')
-        self.session_filename = f'{PSM_SESSION_FILE}_{config_id}'
-        self.cookie_exp_filename = f'{PSM_COOKIE_EXP_FILE}_{config_id}'
+        self.configured_refresh_window = None
+        self.apply_config(config)
+        self.refresh_timer = None
+        self.refresh_at = None
+        self.last_refresh_latency = None
+        self.last_used = time.monotonic()
+        # cleared when the server rejects a gzip encoded request body
+        self.request_compression = True
         self.get_state()
+        self.mount_adapters()
+        self.ensure_login()
 
-        # login if needed
+    def apply_config(self, config):
+        """Take the settings derived from config. Called again when a pooled session is reused,
+           so edits to fields outside the pool key, such as session_refresh_window, take effect.
+        """
+        self.config = config
+        self.store = StateStore(state_id(config))
+
+        refresh_window = config.get('session_refresh_window')
+        refresh_window = int(refresh_window if refresh_window not in (None, '') else SESSION_REFRESH_WINDOW)
+        # refresh() may shrink the window to fit the cookie lifetime - keep that until the setting changes
+        if refresh_window != self.configured_refresh_window:
+            self.configured_refresh_window = self.refresh_window = refresh_window
+
+    def mount_adapters(self):
+        """Mount keep-alive connection pools sized for concurrent use of a pooled session"""
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def cookie_valid(self, min_ttl=0):
+        """True if an auth cookie is held and stays valid for at least min_ttl seconds"""
+        if not self.cookie_expiration:
+            return False
+        return self.cookie_expiration - datetime.now().timestamp() > min_ttl
+
+    def session_id(self):
+        """Returns the current sid cookie value, or None"""
+        for cookie in self.session.cookies:
+            if cookie.name == 'sid':
+                return cookie.value
+        return None
+
+    def ensure_login(self):
+        """Login if the auth cookie is missing or expired"""
         if not self.cookie_expiration:
             logger.info('Authentication cookie not found. Logging in.')
             self.login()
-        elif self.cookie_expiration and datetime.fromtimestamp(self.cookie_expiration) < datetime.now():
+        elif not self.cookie_valid():
             logger.info('Authentication cookie expired. Logging in.')
             self.login()
+        elif not self.cookie_valid(self.refresh_window):
+            # background refresh did not run (e.g. forked worker) - renew before the cookie lapses
+            logger.info('Authentication cookie about to expire. Refreshing.')
+            self.refresh()
+
+    def refresh(self):
+        """Renew the session ahead of expiry and record how long the refresh took"""
+        start = time.monotonic()
+        self.login(min_ttl=self.refresh_window)
+        self.last_refresh_latency = time.monotonic() - start
+        logger.info(f'Session refreshed in {self.last_refresh_latency:.3f}s')
+
+        if not self.cookie_valid(self.refresh_window):
+            # cookie lifetime is shorter than the window - shrink it so we don't refresh in a loop
+            self.refresh_window = max(int(self.cookie_expiration - datetime.now().timestamp()) // 2, 0)
+            logger.warning(f'Session refresh window larger than cookie lifetime. Using {self.refresh_window}s')
+
+    def schedule_refresh(self):
+        """Start a background timer that refreshes the session refresh_window seconds before expiry"""
+        if not self.cookie_expiration:
+            return
 
-    def get_state(self):
-        """Load PSM state from disk and unpickle"""
-        try:
-            with open(os.path.join(TMP_FILE_ROOT, self.session_filename), 'rb') as file:
-                self.session = pickle.load(file)
+        refresh_at = self.cookie_expiration - self.refresh_window
+        if self.refresh_timer and self.refresh_timer.is_alive() and self.refresh_at == refresh_at:
+            return
 
-            with open(os.path.join(TMP_FILE_ROOT, self.cookie_exp_filename), 'rb') as file:
-                self.cookie_expiration = pickle.load(file)
+        self.cancel_refresh()
+        self.refresh_at = refresh_at
+        self.refresh_timer = threading.Timer(max(refresh_at - datetime.now().timestamp(), 0), self._background_refresh)
+        self.refresh_timer.daemon = True
+        self.refresh_timer.start()
 
-            logger.info('Loaded session state successfully')
+    def cancel_refresh(self):
+        """Stop a pending background refresh"""
+        if self.refresh_timer:
+            self.refresh_timer.cancel()
+            self.refresh_timer = None
 
+    def _background_refresh(self):
+        try:
+            self.refresh()
         except Exception as ex:
-            logger.warning(f'Error loading session state: {ex}')
+            # the next request will log in synchronously
+            logger.warning(f'Background session refresh failed: {ex}')
+            return
 
-    def set_state(self):
-        """Pickle PSM state and save to disk"""
-        try:
-            with open(os.path.join(TMP_FILE_ROOT, self.session_filename), 'wb') as file:
-                # Pickle the Requests Session() object
-                pickle.dump(self.session, file, pickle.HIGHEST_PROTOCOL)
+        self.schedule_refresh()
 
-            with open(os.path.join(TMP_FILE_ROOT, self.cookie_exp_filename), 'wb') as file:
-                # Pickle the cookie_expiration variable
-                pickle.dump(self.cookie_expiration, file, pickle.HIGHEST_PROTOCOL)
+    def close(self):
+        """Cancel background work and close pooled connections"""
+        self.cancel_refresh()
+        self.session.close()
 
-        except Exception as ex:
-            logger.exception(f'Error saving session state: {ex}')
-            raise ConnectorError(f'Error saving session state: {ex}')
+    def get_state(self):
+        """Load PSM state from the shared state store"""
+        with span('state_load'):
+            state = self.store.load()
+        if not state:
+            logger.info('No saved session state found')
+            return
 
+        load_cookies(self.session.cookies, state.get('cookies', []))
+        self.cookie_expiration = state.get('cookie_expiration')
+        logger.info('Loaded session state successfully')
+
+    def set_state(self):
+        """Save PSM state to the shared state store"""
+        self.store.save({
+            'cookies': dump_cookies(self.session.cookies),
+            'cookie_expiration': self.cookie_expiration
+        })
         logger.info('Saved session state successfully')
 
-    def login(self):
-        """Authenticates, grabs the cookie, and returns True if login succeeds"""
+    def login(self, min_ttl=0):
+        """Single-flight login across worker processes. Waits on the state store lock,
+           then uses a session another worker refreshed in the meantime or authenticates.
+        """
+        failed_session_id = self.session_id()
+
+        with self.store.lock():
+            self.get_state()
+            if self.cookie_valid(min_ttl) and self.session_id() != failed_session_id:
+                logger.info('Login: using session refreshed by another worker.')
+                return True
+
+            return self.authenticate()
+
+    def authenticate(self):
+        """Authenticates, grabs the cookie, and returns True if login succeeds.
+           Callers must hold the state store lock.
+        """
         headers = {'accept': 'application/json'}
         server_address = self.config.get('server_address')
         endpoint = '/v1/login'
@@ -87,9 +214,13 @@ class PensandoPSM():
 
         req = Request('POST', url, json=data, headers=headers)
         prepped = self.session.prepare_request(req)
+        # outside the try so a DeadlineExceeded reaches the caller as is
+        timeout = request_timeout(self.config)
 
+        inc('logins')
         try:
-            response = self.session.send(prepped, verify=verify_ssl)
+            with span('login'):
+                response = self.session.send(prepped, verify=verify_ssl, timeout=timeout)
             logger.info('Login: Authentication credentials sent.')
 
         except Exception as ex:
@@ -117,22 +248,15 @@ class PensandoPSM():
 
     def _debug_remove_session_state(self):
         try:
-            os.remove(os.path.join(TMP_FILE_ROOT, self.session_filename))
-            os.remove(os.path.join(TMP_FILE_ROOT, self.cookie_exp_filename))
+            self.store.remove()
             logger.debug('Debug: Session state removed from disk')
         except Exception as ex:
             logger.debug(f'Debug: Error removing Session State from disk: {ex}')
 
     def _debug_reset_session_state(self):
         try:
-            reset_session = requests.Session()
-            reset_cookie_expiration = None
-
-            with open(os.path.join(TMP_FILE_ROOT, self.session_filename), 'wb') as file:
-                pickle.dump(reset_session, file, pickle.HIGHEST_PROTOCOL)
-
-            with open(os.path.join(TMP_FILE_ROOT, self.cookie_exp_filename), 'wb') as file:
-                pickle.dump(reset_cookie_expiration, file, pickle.HIGHEST_PROTOCOL)
+            with self.store.lock():
+                self.store.save({'cookies': [], 'cookie_expiration': None})
 
             logger.debug('Session state reset on disk')
         except Exception as ex:
@@ -153,12 +277,103 @@ class PensandoPSM():
             logger.debug(f'Debug: Error expiring session cookie on disk: {ex}')
 
 
-def invoke_rest_endpoint(config, endpoint, method='GET', data=None, headers=None):
-    """Runs the API request"""
+def config_fingerprint(config):
+    """Returns a stable hash of the connection settings used to key per-config state"""
+    fields = ('server_address', 'port', 'username', 'password', 'tenant', 'protocol', 'verify_ssl')
+    raw = '|'.join(str(config.get(field)) for field in fields)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def state_id(config):
+    """Returns the id of config's state files under TMP_FILE_ROOT: its config_id, or the
+       fingerprint of its connection settings. Never a shared id, so configs without a
+       config_id get their own state.
+    """
+    return config.get('config_id') or config_fingerprint(config)
+
+
+def request_sent(ex):
+    """False if a requests connection error or timeout happened before the connection
+       was open, i.e. PSM never saw the request
+    """
+    if isinstance(ex, requests.ConnectTimeout):
+        return False
+    reason = getattr(ex.args[0], 'reason', None) if ex.args else None
+    return not isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def _evict_idle_sessions(idle_timeout):
+    """Close and drop pooled sessions unused for longer than idle_timeout. Caller holds the pool lock."""
+    now = time.monotonic()
+    for key in [k for k, psm in _session_pool.items() if now - psm.last_used > idle_timeout]:
+        logger.info('Session pool: evicting idle session')
+        _session_pool.pop(key).close()
+
+
+def get_psm(config):
+    """Returns a logged in PensandoPSM for config, reusing a pooled one when available"""
+    key = config_fingerprint(config)
+    pool_size = int(config.get('session_pool_size') or SESSION_POOL_SIZE)
+    idle_timeout = int(config.get('session_idle_timeout') or SESSION_IDLE_TIMEOUT)
+
+    with _session_pool_lock:
+        _evict_idle_sessions(idle_timeout)
+        psm = _session_pool.get(key)
+        if psm:
+            _session_pool.move_to_end(key)
+
+    if psm:
+        psm.apply_config(config)
+        psm.ensure_login()
+        psm.schedule_refresh()
+        psm.last_used = time.monotonic()
+        return psm
+
+    psm = PensandoPSM(config)
+
+    with _session_pool_lock:
+        existing = _session_pool.get(key)
+        if existing:
+            # another thread won the race - keep its session and drop ours
+            psm.close()
+            psm = existing
+        else:
+            _session_pool[key] = psm
+
+        while len(_session_pool) > pool_size:
+            _, evicted = _session_pool.popitem(last=False)
+            evicted.close()
+
+    psm.schedule_refresh()
+    psm.last_used = time.monotonic()
+    return psm
+
+
+def release_psm(config):
+    """Drop the pooled session for config so the next request reloads state from disk"""
+    with _session_pool_lock:
+        psm = _session_pool.pop(config_fingerprint(config), None)
+
+    if psm:
+        psm.close()
+
+
+def send_request(config, endpoint, method='GET', data=None, headers=None, params=None, stream=False):
+    """Runs the API request and returns the successful response. params are sent as the
+       query string. With stream=True the body is left unread for incremental decoding.
+       JSON bodies of REQUEST_COMPRESS_MIN_SIZE bytes or more are sent gzip encoded if
+       compress_requests is enabled, until the server rejects one with 415.
+
+       Every attempt has connect and read timeouts and the whole call, including a
+       login, stays within the operation deadline. A 401 triggers one login. SAFE_METHODS
+       are retried up to request_retries times with jittered backoff on connection errors,
+       timeouts and RETRY_STATUS_CODES. Other methods may have been applied by PSM before
+       a read timeout or a gateway error, so they are only retried when the connection
+       could not be opened or PSM answered with UNPROCESSED_STATUS_CODES.
+    """
     if headers is None:
         headers = {'accept': 'application/json'}
 
-    psm = PensandoPSM(config)
     server_address = config.get('server_address')
     port = config.get('port', '443')
     username = config.get('username')
@@ -172,30 +387,316 @@ def invoke_rest_endpoint(config, endpoint, method='GET', data=None, headers=None
         raise ConnectorError('Missing required parameters')
 
     url = f'{protocol}://{server_address}:{port}{endpoint}'
-
-    try:
-        req = Request(method, url, json=data, headers=headers)
-        prepped = psm.session.prepare_request(req)
-        response = psm.session.send(prepped, verify=verify_ssl)
-        logger.info(f'REST request sent: {url}')
-
-    except Exception as ex:
-        logger.exception(f'Error invoking endpoint: {endpoint}')
-        raise ConnectorError(f'Error: {ex}')
-
-    if response.ok:
-        return response.json()
-
-    if response.status_code == 401:
-        logger.warning('Unauthorized request - Trying to Login...')
-
-        # try to login - if success, then rerun the request. if login fails, then stop
-        if psm.login():
-            logger.info('Login Success: Retrying REST Request...')
-            return invoke_rest_endpoint(config, endpoint, method, data, headers)
-
-    logger.exception(response.content)
-    raise ConnectorError(f'Request error: {response.status_code} - {response.content}')
+    retries = int(config.get('request_retries') if config.get('request_retries') not in (None, '') else REQUEST_RETRIES)
+    safe = method.upper() in SAFE_METHODS
+
+    json_body = None
+    if data is not None:
+        json_body = json.dumps(data, allow_nan=False).encode('utf-8')
+    decoded_size = len(json_body or b'')
+
+    breaker = get_breaker(config, state_id(config))
+
+    with deadline_scope(config):
+        if breaker:
+            breaker.before_call(config)
+        # False while the outcome of the current attempt is not reported to the breaker
+        started = time.monotonic()
+        recorded = False
+        try:
+            psm = get_psm(config)
+            attempt = 0
+            logged_in = False
+
+            while True:
+                if breaker:
+                    breaker.before_call(config)
+                body = json_body
+                compressed = False
+                request_headers = dict(headers)
+                if body is not None:
+                    request_headers['Content-Type'] = 'application/json'
+                if config.get('compress_requests') and psm.request_compression and decoded_size >= REQUEST_COMPRESS_MIN_SIZE:
+                    body = compress_body(body)
+                    request_headers['Content-Encoding'] = 'gzip'
+                    compressed = True
+
+                started = time.monotonic()
+                recorded = False
+                try:
+                    req = Request(method, url, data=body, headers=request_headers, params=params)
+                    prepped = psm.session.prepare_request(req)
+                    response = psm.session.send(prepped, verify=verify_ssl, stream=stream, timeout=request_timeout(config))
+                    logger.info(f'REST request sent: {url}')
+
+                except (requests.ConnectionError, requests.Timeout) as ex:
+                    inc('request_errors')
+                    if breaker:
+                        breaker.record(config, True, time.monotonic() - started)
+                    recorded = True
+
+                    # a request that never connected was not processed, so it is safe to resend
+                    if (safe or not request_sent(ex)) and attempt < retries:
+                        attempt += 1
+                        inc('retries')
+                        logger.warning(f'Error invoking endpoint: {endpoint}: {ex} - Retry {attempt} of {retries}...')
+                        backoff(attempt)
+                        continue
+
+                    logger.exception(f'Error invoking endpoint: {endpoint}')
+                    raise ConnectorError(f'Error: {ex}')
+
+                except ConnectorError:
+                    raise
+
+                except Exception as ex:
+                    logger.exception(f'Error invoking endpoint: {endpoint}')
+                    raise ConnectorError(f'Error: {ex}')
+
+                latency = time.monotonic() - started
+                observe('request', latency)
+                if breaker:
+                    unhealthy = response.status_code >= 500 or response.status_code in RETRY_STATUS_CODES
+                    breaker.record(config, unhealthy, latency)
+                recorded = True
+
+                if stream:
+                    # the response body is accounted for by the reader
+                    record_transfer(len(body or b''), decoded_size)
+                else:
+                    record_transfer(len(body or b''), decoded_size, response_wire_bytes(response), len(response.content))
+
+                if response.ok:
+                    return response
+
+                if response.status_code == 415 and compressed:
+                    logger.warning('Server does not accept gzip encoded requests - Sending uncompressed...')
+                    response.close()
+                    psm.request_compression = False
+                    continue
+
+                if response.status_code == 401 and not logged_in:
+                    logger.warning('Unauthorized request - Trying to Login...')
+                    response.close()
+                    logged_in = True
+                    inc('relogins')
+
+                    # try to login - if success, then rerun the request. if login fails, then stop
+                    started = time.monotonic()
+                    recorded = False
+                    if psm.login():
+                        logger.info('Login Success: Retrying REST Request...')
+                        continue
+
+                retryable = RETRY_STATUS_CODES if safe else UNPROCESSED_STATUS_CODES
+                if response.status_code in retryable and attempt < retries:
+                    attempt += 1
+                    inc('retries')
+                    logger.warning(f'Request error: {response.status_code} - Retry {attempt} of {retries}...')
+                    response.close()
+                    backoff(attempt)
+                    continue
+
+                logger.exception(response.content)
+                raise PSMRequestError(f'Request error: {response.status_code} - {response.content}', response.status_code)
+
+        except CircuitOpenError:
+            raise
+
+        except Exception:
+            # a failed login or an exhausted deadline counts as a failed call, and
+            # ends a half-open probe that would otherwise stay active on this thread
+            if breaker and not recorded:
+                breaker.record(config, True, time.monotonic() - started)
+            raise
+
+
+def parse_json(body):
+    """Parse a JSON response body, timed as the json_parse span"""
+    with span('json_parse'):
+        return json.loads(body)
+
+
+def invoke_rest_endpoint(config, endpoint, method='GET', data=None, headers=None, params=None, projection=None):
+    """Runs the API request and returns the parsed response. params are sent as the query string.
+       projection is a compiled field tree (see projection.compile_projection) applied to the response.
+    """
+    cache_size = config.get('response_cache_size')
+    cache_size = int(float(RESPONSE_CACHE_SIZE if cache_size in (None, '') else cache_size) * 1024 * 1024)
+    if cache_size <= 0:
+        response = send_request(config, endpoint, method, data, headers, params)
+        return project_response(parse_json(response.content), projection)
+
+    scope = (config_fingerprint(config), config.get('tenant'))
+    if method != 'GET':
+        # drop cached reads the write may change, even if the write fails
+        response_cache.invalidate(scope, endpoint)
+        response = send_request(config, endpoint, method, data, headers, params)
+        return project_response(parse_json(response.content), projection)
+
+    return project_response(cached_get(config, endpoint, headers, params, scope, cache_size), projection)
+
+
+def cached_get(config, endpoint, headers, params, scope, cache_size):
+    """GET through the response cache. Returns the parsed body."""
+    key = (scope, endpoint, tuple(sorted((params or {}).items())))
+    ttl = response_cache.ttl(config.get('response_cache_ttls'), endpoint)
+    entry = response_cache.get(key)
+
+    if entry and time.monotonic() - entry.validated_at < ttl:
+        response_cache.record('hits')
+        return parse_json(entry.body)
+
+    request_headers = dict(headers or {'accept': 'application/json'})
+    if entry:
+        request_headers.update(entry.conditional_headers())
+
+    response = send_request(config, endpoint, 'GET', None, request_headers, params)
+    if response.status_code == 304 and entry:
+        entry.validated_at = time.monotonic()
+        response_cache.record('revalidated')
+        return parse_json(entry.body)
+
+    response_cache.record('misses')
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    # without a validator an entry is only useful while it is fresh
+    if etag or last_modified or ttl > 0:
+        response_cache.put(key, CacheEntry(response.content, etag, last_modified), cache_size)
+
+    return parse_json(response.content)
+
+
+def stream_list_items(config, endpoint, params=None, projection=None):
+    """Yields the items of one PSM list response as they are decoded from the socket,
+       without holding the body or the parsed list in memory
+    """
+    response = send_request(config, endpoint, 'GET', params=params, stream=True)
+    decoded_size = 0
+
+    def chunks():
+        nonlocal decoded_size
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            decoded_size += len(chunk)
+            yield chunk
+
+    with response:
+        try:
+            for item in JSONListStream(chunks()):
+                yield project(item, projection)
+
+        except ValueError as ex:
+            logger.exception(f'Error decoding response from {endpoint}')
+            raise ConnectorError(f'Error decoding response from {endpoint}: {ex}')
+
+        finally:
+            record_transfer(response_bytes=response_wire_bytes(response), response_bytes_decoded=decoded_size, requests=0)
+
+
+def iterate_list_pages(config, endpoint, page_size=LIST_PAGE_SIZE, limit=None, params=None, projection=None):
+    """Yields the pages of a PSM list endpoint, requesting page_size items at a time
+       with the 'from' (1 based offset) and 'max-results' list options. Stops after
+       limit items if limit is set. Each page is projected as soon as it is parsed.
+    """
+    offset = 1
+    fetched = 0
+    while limit is None or fetched < limit:
+        max_results = page_size if limit is None else min(page_size, limit - fetched)
+        query = dict(params or {})
+        query.update({'from': offset, 'max-results': max_results})
+
+        page = invoke_rest_endpoint(config, endpoint, 'GET', params=query, projection=projection)
+        items = page.get('items') or []
+
+        if len(items) > max_results:
+            # server ignored the list options and returned everything
+            logger.warning(f'{endpoint} does not support pagination. Returning the full list.')
+            page['items'] = items if limit is None else items[:limit - fetched]
+            yield page
+            return
+
+        yield page
+        fetched += len(items)
+        offset += len(items)
+
+        if len(items) < max_results:
+            return
+
+
+def iterate_list_items(config, endpoint, page_size=LIST_PAGE_SIZE, limit=None, params=None, projection=None):
+    """Yields the items of a PSM list endpoint one at a time. Pages are requested like
+       iterate_list_pages but decoded incrementally, so memory is bounded by one item.
+    """
+    offset = 1
+    fetched = 0
+    while limit is None or fetched < limit:
+        max_results = page_size if limit is None else min(page_size, limit - fetched)
+        query = dict(params or {})
+        query.update({'from': offset, 'max-results': max_results})
+
+        count = 0
+        for item in stream_list_items(config, endpoint, query, projection):
+            if limit is not None and fetched >= limit:
+                break
+            count += 1
+            fetched += 1
+            yield item
+
+        if count > max_results:
+            # server ignored the list options and returned everything
+            logger.warning(f'{endpoint} does not support pagination. Returned the full list.')
+            return
+
+        if count < max_results:
+            return
+        offset += count
+
+
+def tenant_endpoint(prefix, kind, tenant=None):
+    """Returns the tenant scoped list endpoint for kind, or the all-tenants one if tenant is not set"""
+    if tenant:
+        return f'{prefix}/tenant/{tenant}/{kind}'
+    return f'{prefix}/{kind}'
+
+
+def list_options(params):
+    """Builds the PSM list options (label-selector, field-selector) from the label_selector,
+       field_selector and namespace operation parameters. namespace is added to the
+       field selector as meta.namespace so PSM filters before anything is sent.
+    """
+    options = {}
+    label_selector = (params.get('label_selector') or '').strip()
+    if label_selector:
+        options['label-selector'] = label_selector
+
+    field_selectors = [(params.get('field_selector') or '').strip()]
+    namespace = (params.get('namespace') or '').strip()
+    if namespace:
+        field_selectors.append(f'meta.namespace={namespace}')
+    field_selector = ','.join(filter(None, field_selectors))
+    if field_selector:
+        options['field-selector'] = field_selector
+
+    return options
+
+
+def list_endpoint(config, endpoint, params):
+    """Collects a paginated PSM list using the page_size, limit, selector and fields operation
+       parameters. Returns the first page's envelope (kind, list-meta) with all collected items.
+    """
+    page_size = int(params.get('page_size') or LIST_PAGE_SIZE)
+    limit = int(params.get('limit') or 0) or None
+    projection = compile_projection(params.get('fields'))
+
+    result = None
+    for page in iterate_list_pages(config, endpoint, page_size, limit, list_options(params), projection):
+        if result is None:
+            result = page
+            result['items'] = list(page.get('items') or [])
+        else:
+            result['items'].extend(page.get('items') or [])
+
+    return result
 
 
 def normalize_list_input(user_input):